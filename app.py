@@ -1,15 +1,30 @@
-from flask import Flask, request, jsonify, render_template, session
-import google.generativeai as genai
+from flask import Flask, request, jsonify, render_template, session, Response, stream_with_context, g
 import os
 from dotenv import load_dotenv
-from difflib import get_close_matches
 import logging
 from datetime import datetime, timedelta
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import random
 import json
+import threading
+import time
 import traceback # Import traceback for detailed error logging
+from faq_index import FAQIndex
+from response_cache import ResponseCache, catalog_fingerprint
+from order_store import open_order_store
+from order_status import OrderStatusScheduler
+from shared_state import open_shared_state
+from order_ids import OrderIdAllocator, ShardLease
+from order_index import OrderIndex, range_bound
+from response_renderer import ResponseRenderer
+from intent_router import IntentRouter
+from conversation_store import ConversationStore, SharedConversationStore
+from catalog_store import CatalogStore
+from context_builder import ContextBuilder
+from gemini_client import GeminiClient, CircuitBreaker, GeminiUnavailable, LazyModel
+from logging_setup import configure_logging_from_env
+from metrics import (registry as metrics_registry, CHAT_LATENCY, GEMINI_LATENCY, GEMINI_CALLS,
+                     ORDER_STORE_WRITE, SESSION_COOKIE_BYTES, GEMINI_PROMPT_TOKENS, is_timeout)
 
 # --- Setup ---
 
@@ -18,6 +33,14 @@ load_dotenv()
 
 app = Flask(__name__)
 
+# Logging: records are queued and written in batches by a background thread (see logging_setup.py).
+# LOG_LEVEL=DEBUG for development; LOG_LEVELS=gemini=DEBUG / LOG_SAMPLING=chat=0.1 tune categories;
+# LOG_FORMAT=json writes JSON lines; LOG_MAX_BYTES or LOG_ROTATE_WHEN=midnight control rotation.
+configure_logging_from_env(prefix="beautybot")
+chat_log = logging.getLogger("beautybot.chat")
+orders_log = logging.getLogger("beautybot.orders")
+gemini_log = logging.getLogger("beautybot.gemini")
+
 # Configuration
 app.secret_key = os.getenv("FLASK_SECRET_KEY")
 if not app.secret_key:
@@ -25,23 +48,28 @@ if not app.secret_key:
                     "Ensure this is set for production for security reasons.")
     app.secret_key = "super_secret_fallback_key_for_dev" # Use a strong, random key in production!
 
-# Logging
-os.makedirs("logs", exist_ok=True)
-logging.basicConfig(
-    filename=f"logs/chatbot_{datetime.now().strftime('%Y%m%d')}.log",
-    level=logging.DEBUG, # Set to DEBUG for more detailed logging during development/debugging
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-logging.getLogger().setLevel(logging.DEBUG) # Redundant with basicConfig level, but doesn't hurt.
+# Shared state: stock, order ID sequences and rate limit counters that every worker must agree on.
+# memory:// (default) is per-process; use sqlite:///shared_state.db for several workers on one host,
+# or redis://host:6379/0 for several hosts.
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+shared_state = open_shared_state(SHARED_STATE_URL)
 
 # Rate limiting
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    storage_uri="memory://", # In-memory storage means limits reset on service restart
-    default_limits=["200 per day", "50 per hour"]
-)
+if SHARED_STATE_URL.startswith("memory://"):
+    limiter = Limiter(
+        app=app,
+        key_func=get_remote_address,
+        storage_uri="memory://", # In-memory storage means limits reset on service restart
+        default_limits=["200 per day", "50 per hour"]
+    )
+else:
+    limiter = Limiter(
+        app=app,
+        key_func=get_remote_address,
+        storage_uri="sharedstate://", # Counters live in the shared state backend
+        storage_options={"backend": shared_state},
+        default_limits=["200 per day", "50 per hour"]
+    )
 
 # Gemini AI Configuration - CRITICAL SECTION
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -54,308 +82,259 @@ if not GEMINI_API_KEY:
     # raise ValueError("GEMINI_API_KEY is not set. Cannot start chatbot.")
     model = None # Ensure model is None if API key is missing
 else:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        logging.info("Gemini API key successfully configured.")
-        model = genai.GenerativeModel("models/gemini-1.5-flash") # Or "models/gemini-pro"
-        logging.info(f"Gemini GenerativeModel '{model.model_name}' initialized.")
-    except Exception as e:
-        logging.critical(f"FATAL ERROR: Failed to configure or initialize Gemini AI model: {e}")
-        logging.critical(traceback.format_exc()) # Log the full traceback
-        model = None # Set model to None if initialization fails
+    # The SDK is imported when first needed: GEMINI_INIT=lazy (default) on the first fallback call,
+    # background on a thread right after startup, eager here before the first request is served.
+    model = LazyModel(GEMINI_API_KEY, "models/gemini-1.5-flash") # Or "models/gemini-pro"
+    GEMINI_INIT = os.getenv("GEMINI_INIT", "lazy")
+    if GEMINI_INIT == "eager":
+        try:
+            model.get()
+        except RuntimeError:
+            model = None # Set model to None if initialization fails
+    elif GEMINI_INIT == "background":
+        model.warm_up()
+
+# Every Gemini call goes through one bounded client, so a slow or failing backend degrades AI answers
+# (see degraded_answer()) instead of tying up the threads that serve FAQ, catalog and order traffic.
+# A chat request gets GEMINI_REQUEST_BUDGET seconds in total; each call's timeout is what is left of it.
+GEMINI_REQUEST_BUDGET = float(os.getenv("GEMINI_REQUEST_BUDGET", 25))
+GEMINI_DEGRADED_FAQ_CUTOFF = float(os.getenv("GEMINI_DEGRADED_FAQ_CUTOFF", 0.4))
+gemini_client = GeminiClient(
+    model,
+    max_in_flight=int(os.getenv("GEMINI_MAX_IN_FLIGHT", 8)),
+    queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT", 2)),
+    hedge_after=float(os.getenv("GEMINI_HEDGE_AFTER")) if os.getenv("GEMINI_HEDGE_AFTER") else None,
+    breaker=CircuitBreaker(failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", 5)),
+                           reset_after=float(os.getenv("GEMINI_BREAKER_RESET", 30)))
+)
+
+# Gemini fallback response cache (set AI_CACHE_SIMILARITY, e.g. 0.9, to serve near-duplicate questions)
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", 1024)),
+    ttl=int(os.getenv("AI_CACHE_TTL", 3600)),
+    max_bytes=int(os.getenv("AI_CACHE_MAX_BYTES", 2 * 1024 * 1024)),
+    similarity=float(os.getenv("AI_CACHE_SIMILARITY")) if os.getenv("AI_CACHE_SIMILARITY") else None
+)
+
+# Conversation history lives server-side; only the conversation ID goes into the cookie.
+# A conversation's requests can land on any worker, so with a shared SHARED_STATE_URL the history
+# lives there too; memory:// keeps it in this process (HISTORY_MAX_CONVERSATIONS only applies here).
+if SHARED_STATE_URL.startswith("memory://"):
+    conversations = ConversationStore(
+        max_turns=int(os.getenv("HISTORY_MAX_TURNS", 10)),
+        idle_ttl=int(os.getenv("HISTORY_IDLE_TTL", 1800)),
+        max_conversations=int(os.getenv("HISTORY_MAX_CONVERSATIONS", 10000)),
+        summary_chars=int(os.getenv("HISTORY_SUMMARY_CHARS", 0))
+    )
+else:
+    conversations = SharedConversationStore(
+        shared_state,
+        max_turns=int(os.getenv("HISTORY_MAX_TURNS", 10)),
+        idle_ttl=int(os.getenv("HISTORY_IDLE_TTL", 1800)),
+        summary_chars=int(os.getenv("HISTORY_SUMMARY_CHARS", 0))
+    )
+# Gemini gets as many recent turns as fit HISTORY_TOKEN_BUDGET (estimated tokens) on top of the prompt
+context_builder = ContextBuilder(history_tokens=int(os.getenv("HISTORY_TOKEN_BUDGET", 800)))
+
+# Scrape-time gauges for /metrics (the per-request histograms live in metrics.py)
+metrics_registry.gauge("beautybot_response_cache_entries", "Cached Gemini answers",
+                       lambda: response_cache.stats()["entries"])
+metrics_registry.gauge("beautybot_response_cache_hits", "Gemini cache hits (exact + similar)",
+                       lambda: response_cache.hits + response_cache.similar_hits)
+metrics_registry.gauge("beautybot_response_cache_misses", "Gemini cache misses", lambda: response_cache.misses)
+if isinstance(conversations, ConversationStore):
+    metrics_registry.gauge("beautybot_conversations", "Conversations held in memory",
+                           lambda: conversations.stats()["conversations"])
+metrics_registry.gauge("beautybot_orders", "Orders known to this worker", lambda: len(orders))
+metrics_registry.gauge("beautybot_gemini_in_flight", "Gemini calls in progress", lambda: gemini_client.in_flight)
+metrics_registry.gauge("beautybot_gemini_queue_depth", "Requests waiting for a Gemini slot",
+                       lambda: gemini_client.waiting)
+metrics_registry.gauge("beautybot_gemini_circuit_open", "1 while the Gemini circuit breaker rejects calls",
+                       lambda: int(gemini_client.breaker.state != CircuitBreaker.CLOSED))
+metrics_registry.gauge("beautybot_gemini_hedged_calls", "Hedged second attempts sent to Gemini",
+                       lambda: gemini_client.hedges)
 
 # --- Data Stores ---
-PRODUCTS = {
-    "1) Hydrating Milky Cleanser": {"name": "Hydrating Milky Cleanser", "price": 399, "stock": 50},
-    "2) Hyaluronic Acid Serum": {"name": "Hyaluronic Acid Serum", "price": 899, "stock": 40},
-    "3) Ceramide Moisturizer": {"name": "Ceramide Moisturizer", "price": 599, "stock": 35},
-    "4) Oil-Control Foaming Facewash": {"name": "Oil-Control Foaming Facewash", "price": 349, "stock": 50},
-    "5) pH-Balanced Gel Cleanser": {"name": "pH-Balanced Gel Cleanser", "price": 449, "stock": 50},
-    "6) Multi Vitamin Serum": {"name": "Multi-Vitamin Serum", "price": 849, "stock": 35},
-    "7) Lightweight Moisturizer": {"name": "Lightweight Moisturizer", "price": 549, "stock": 40},
-    "8) Fragrance-Free Cream Cleanser": {"name": "Fragrance-Free Cream Cleanser", "price": 499, "stock": 45},
-    "9) Calming Serum": {"name": "Calming Serum", "price": 899, "stock": 30},
-    "10) Barrier Repair Cream": {"name": "Barrier Repair Cream", "price": 649, "stock": 35},
-}
+# Products and FAQ answers live in CATALOG_FILE (questions point at deduplicated answers).
+# Every worker polls the file and swaps in a changed catalog without a restart, see apply_catalog().
+catalog = CatalogStore(os.getenv("CATALOG_FILE", "catalog.json"))
+try:
+    PRODUCTS, FAQS = catalog.load()
+except (OSError, ValueError) as e:
+    logging.critical(f"FATAL ERROR: Could not load the catalog from {catalog.path}: {e}")
+    PRODUCTS, FAQS = {}, {}
+
+
+def sync_stock(products):
+    """The shared backend owns stock levels; the first worker to see a product seeds it"""
+    shared_state.init_stock({key: product["stock"] for key, product in products.items()})
+    for key in products:
+        products[key]["stock"] = shared_state.get_stock(key)
+
+
+sync_stock(PRODUCTS)
 
 # Order storage with persistence (Note: On Render free tier, this will reset on deploy/idle)
+# ORDER_STORE=journal (default) keeps orders.json as a snapshot plus an append-only journal;
+# ORDER_STORE=sqlite keeps them in orders.db (importing orders.json on first start).
 ORDERS_FILE = "orders.json"
+ORDER_STORE = os.getenv("ORDER_STORE", "journal")
 
-def load_orders():
-    try:
-        if os.path.exists(ORDERS_FILE):
-            with open(ORDERS_FILE, 'r') as f:
-                loaded_orders = json.load(f)
-                logging.info(f"Loaded {len(loaded_orders)} orders from {ORDERS_FILE}")
-                return loaded_orders
-        else:
-            logging.info(f"Orders file {ORDERS_FILE} not found. Starting with empty orders.")
-            return {}
-    except json.JSONDecodeError as e:
-        logging.error(f"Error decoding {ORDERS_FILE}: {e}")
-        logging.error(traceback.format_exc())
-        return {}
-    except Exception as e:
-        logging.error(f"Unexpected error loading orders from {ORDERS_FILE}: {e}")
-        logging.error(traceback.format_exc())
-        return {}
+if ORDER_STORE == "sqlite":
+    order_store = open_order_store("sqlite", path=os.getenv("ORDERS_DB", "orders.db"), import_from=ORDERS_FILE)
+else:
+    order_store = open_order_store(
+        "journal",
+        snapshot_path=ORDERS_FILE,
+        journal_path=os.getenv("ORDERS_JOURNAL", "orders.journal.jsonl"),
+        compact_every=int(os.getenv("ORDERS_COMPACT_EVERY", 1000)),
+        fsync=os.getenv("ORDERS_FSYNC", "1") != "0",
+        snapshot_cache=os.getenv("ORDERS_SNAPSHOT_CACHE", "1") != "0"
+    )
+
+# gthread workers serve requests concurrently, so order mutations and saves are serialized
+orders_lock = threading.RLock()
 
 
-def save_orders():
+def save_order(order_id, fields=None):
+    """Persist one new order, or just the changed fields of an existing one"""
     try:
-        with open(ORDERS_FILE, 'w') as f:
-            json.dump(orders, f, indent=4)
-            logging.info(f"Saved {len(orders)} orders to {ORDERS_FILE}")
+        with ORDER_STORE_WRITE.time("put" if fields is None else "update"):
+            if fields is None:
+                order_store.put(order_id, orders[order_id])
+            else:
+                order_store.update(order_id, fields)
+        orders_log.info("Saved order %s to %s order store", order_id, ORDER_STORE)
     except Exception as e:
-        logging.error(f"Error saving orders to {ORDERS_FILE}: {e}")
-        logging.error(traceback.format_exc())
+        orders_log.error("Error saving order %s to %s order store: %s", order_id, ORDER_STORE, e, exc_info=True)
 
-orders = load_orders()
+
+try:
+    orders = order_store.load()
+except Exception as e:
+    logging.error(f"Unexpected error loading orders from {ORDER_STORE} order store: {e}")
+    logging.error(traceback.format_exc())
+    orders = {}
+
+
+# Order IDs come from per-worker blocks of a shared sequence (BEAUTY10000, BEAUTY10001, ...).
+# memory:// keeps the sequence per process, so each worker also takes its own shard of the ID space;
+# ORDER_ID_SHARDS must be at least the number of processes sharing the order files.
+if SHARED_STATE_URL.startswith("memory://"):
+    order_id_shards = ShardLease(os.getenv("ORDER_ID_SHARDS", os.getenv("WEB_CONCURRENCY", 1)),
+                                 lock_prefix=os.getenv("ORDER_ID_SHARD_LOCK", "order_ids.shard"))
+else:
+    order_id_shards = None
+order_id_allocator = OrderIdAllocator(shared_state, block_size=int(os.getenv("ORDER_ID_BLOCK_SIZE", 100)),
+                                      shards=order_id_shards)
+order_id_allocator.seed(orders)
+
+# Placement-time index behind the batch order API (kept in step wherever orders are added)
+order_index = OrderIndex(orders)
 
 
 # --- Helper Functions ---
 def generate_order_id():
-    return f"BEAUTY{random.randint(1000, 9999)}"
+    return order_id_allocator.allocate()
 
 
 def create_delivery_date():
     return (datetime.now() + timedelta(days=3)).strftime("%d %b %Y")
 
 
-def update_order_status():
-    """Simulate status changes over time"""
-    orders_changed = False
-    for order_id in orders:
-        original_status = orders[order_id]["status"]
-        if orders[order_id]["status"] == "Confirmed":
-            if random.random() > 0.7:  # 30% chance to advance status
-                orders[order_id]["status"] = "Shipped"
-                orders_changed = True
-        elif orders[order_id]["status"] == "Shipped":
-            if random.random() > 0.8:  # 20% chance to deliver
-                orders[order_id]["status"] = "Delivered"
-                orders_changed = True
-        if original_status != orders[order_id]["status"]:
-            logging.info(f"Order {order_id} status changed from {original_status} to {orders[order_id]['status']}")
-    if orders_changed:
-        save_orders()
-
-
-FAQS = {
-    # ==== Core Product Categories ====
-    "Hi": """Hi there!💖 I'm BeautyBot. Need help with skincare?
-    You can:
-    – Ask about products
-    – Place an order (like: order sunscreen)
-    – Track an order (try: where is my order?)""",
-    "Hello ": """Hello! BeautyBot here 💖
-    Ask me about skincare products,
-    Place an order (e.g., order sunscreen),
-    Or track one (e.g., where is my order).""",
-    "products you sell": "We offer:\n\n"
-                         "🧴 *Cleansers*: Foaming, Milky, Gel\n"
-                         "☀ *Sunscreens*: SPF 30/50, Matte, Mineral\n"
-                         "💧 *Serums*: Vitamin C, Hyaluronic Acid, Retinol\n"
-                         "🌿 *Toners*: Hydrating, Exfoliating (AHA/BHA)\n"
-                         "🧴 *Moisturizers*: Gel, Cream, Oil-Free\n"
-                         "🛡 *Eye Creams*: Dark Circles, Puffiness\n"
-                         "🧖 *Masks*: Clay, Sheet, Overnight\n"
-                         "✨ *Exfoliators*: Scrubs, Chemical Peels",
-
-    # ==== Product Recommendations ====
-    "what is best for dry skin": "Try our:\n"
-                                 "- Hydrating Milky Cleanser (₹399)\n"
-                                 "- Hyaluronic Acid Serum (₹899)\n"
-                                 "- Ceramide Moisturizer (₹599)",
-    "recommend product for dry skin": "Try our:\n"
-                                      "- Hydrating Milky Cleanser (₹399)\n"
-                                      "- Hyaluronic Acid Serum (₹899)\n"
-                                      "- Ceramide Moisturizer (₹599)",
-    "good product for dry skin": "Try our:\n"
-                                 "- Hydrating Milky Cleanser (₹399)\n"
-                                 "- Hyaluronic Acid Serum (₹899)\n"
-                                 "- Ceramide Moisturizer (₹599)",
-    "what is best for oily skin": "Recommended:\n"
-                                  "- Oil-Control Foaming Facewash (₹349)\n"
-                                  "- Niacinamide Serum (₹799)\n"
-                                  "- Matte Sunscreen SPF 50 (₹599)",
-    "recommend product for oily skin": "Recommended:\n"
-                                       "- Oil-Control Foaming Facewash (₹349)\n"
-                                       "- Niacinamide Serum (₹799)\n"
-                                       "- Matte Sunscreen SPF 50 (₹599)",
-    "good product for oily skin": "Recommended:\n"
-                                  "- Oil-Control Foaming Facewash (₹349)\n"
-                                  "- Niacinamide Serum (₹799)\n"
-                                  "- Matte Sunscreen SPF 50 (₹599)",
-    "what is best for acne-prone skin": "Clarifying solutions:\n"
-                                        "- Salicylic Acid Cleanser (₹379)\n"
-                                        "- BHA Exfoliating Toner (₹699)\n"
-                                        "- Oil-Free Moisturizer (₹529)",
-    "recommend product for acne-prone skin": "Clarifying solutions:\n"
-                                             "- Salicylic Acid Cleanser (₹379)\n"
-                                             "- BHA Exfoliating Toner (₹699)\n"
-                                             "- Oil-Free Moisturizer (₹529)",
-    "good product for acne-prone skin": "Clarifying solutions:\n"
-                                        "- Salicylic Acid Cleanser (₹379)\n"
-                                        "- BHA Exfoliating Toner (₹699)\n"
-                                        "- Oil-Free Moisturizer (₹529)",
-    "what is best for combination skin": "Perfect balance:\n"
-                                         "- pH-Balanced Gel Cleanser (₹449)\n"
-                                         "- Multi-Vitamin Serum (₹849)\n"
-                                         "- Lightweight Moisturizer (₹549)",
-    "recommend product for combination skin": "Perfect balance:\n"
-                                              "- pH-Balanced Gel Cleanser (₹449)\n"
-                                              "- Multi-Vitamin Serum (₹849)\n"
-                                              "- Lightweight Moisturizer (₹549)",
-    "good product for combination skin": "Perfect balance:\n"
-                                         "- pH-Balanced Gel Cleanser (₹449)\n"
-                                         "- Multi-Vitamin Serum (₹849)\n"
-                                         "- Lightweight Moisturizer (₹549)",
-    "what is best for sensitive skin": "Gentle care:\n"
-                                       "- Fragrance-Free Cream Cleanser (₹499)\n"
-                                       "- Calming Serum (₹899)\n"
-                                       "- Barrier Repair Cream (₹649)",
-    "recommend product for sensitive skin": "Gentle care:\n"
-                                            "- Fragrance-Free Cream Cleanser (₹499)\n"
-                                            "- Calming Serum (₹899)\n"
-                                            "- Barrier Repair Cream (₹649)",
-    "good product for sensitive skin": "Gentle care:\n"
-                                       "- Fragrance-Free Cream Cleanser (₹499)\n"
-                                       "- Calming Serum (₹899)\n"
-                                       "- Barrier Repair Cream (₹649)",
-    "what is best for mature skin": "Age-defying:\n"
-                                    "- Anti-Aging Cream Cleanser (₹599)\n"
-                                    "- Retinol Night Serum (₹1199)\n"
-                                    "- Firming Day Cream (₹899)",
-    "recommend product for mature skin": "Age-defying:\n"
-                                         "- Anti-Aging Cream Cleanser (₹599)\n"
-                                         "- Retinol Night Serum (₹1199)\n"
-                                         "- Firming Day Cream (₹899)",
-    "good product for mature skin": "Age-defying:\n"
-                                    "- Anti-Aging Cream Cleanser (₹599)\n"
-                                    "- Retinol Night Serum (₹1199)\n"
-                                    "- Firming Day Cream (₹899)",
-    "what is best for normal skin": "Maintenance essentials:\n"
-                                    "- Gentle Foam Cleanser (₹349)\n"
-                                    "- Antioxidant Serum (₹749)\n"
-                                    "- Hydrating Fluid (₹499)",
-    "recommend product for normal skin": "Maintenance essentials:\n"
-                                         "- Gentle Foam Cleanser (₹349)\n"
-                                         "- Antioxidant Serum (₹749)\n"
-                                         "- Hydrating Fluid (₹499)",
-    "good product for normal skin": "Maintenance essentials:\n"
-                                    "- Gentle Foam Cleanser (₹349)\n"
-                                    "- Antioxidant Serum (₹749)\n"
-                                    "- Hydrating Fluid (₹499)",
-    "good skin care routine ": """Cleanse your face twice daily with a gentle, pH-balanced cleanser.
-    Moisturize and apply sunscreen (SPF 30+) every morning, and use a hydrating serum or treatment at night. """,
-
-    # ==== Pricing ====
-    "price list": "Popular Products:\n"
-                  "- Facewashes: ₹349-₹499\n"
-                  "- Serums: ₹799-₹1299\n"
-                  "- Sunscreens: ₹499-₹799\n"
-                  "Full list at [Website Link]",
-
-    # ==== Usage Guidance ====
-    "how to use retinol": "Start 2 times a week at night → Moisturize after → Always use SPF in morning.",
-    "can I use vitamin c with niacinamide": "Yes! They work well together for brightening and hydration.",
-
-    # ==== Shipping/Returns ====
-    "delivery time": "📦 Standard: 3-5 days | Express: 2 days (additional charges apply).",
-    "return policy": "🔄 Unopened products: 30 days | Opened: 15 days (partial refund).",
-
-    # ==== Safety/Ingredients ====
-    "cruelty-free": "✅ All our products are Leaping Bunny certified cruelty-free!",
-    "vegan products": "🌱 Vegan options:\n- Green Tea Toner\n- Aloe Moisturizer\n- Mineral Sunscreen",
-
-    # ==== Customer Support ====
-    "contact support": "Need any help \n Feel free to contact at  "
-                       "📞 Call: 0313-7638717\n"
-                       "📧 Email: care@beautybot.com\n"
-                       "⏰ Hours: 10AM-7PM (Mon-Sat)"
-}
+def sse_event(payload):
+    return f"data: {json.dumps(payload)}\n\n"
 
 
-# --- Routes ---
-@app.route('/')
-def home():
-    logging.info(f"Request to home page from {request.remote_addr}")
-    return render_template("index.html")
+def on_order_status_change(changes):
+    # Not persisted: status follows from the timestamp, so every worker (and a restart) derives the same one
+    for order_id, old_status, new_status in changes:
+        orders_log.info("Order %s status changed from %s to %s", order_id, old_status, new_status)
 
 
-@app.route('/chat', methods=['POST'])
-@limiter.limit("5 per minute")
-def chat():
-    # Initialize session history
-    if 'history' not in session:
-        session['history'] = []
-        logging.info(f"Session history initialized for {request.remote_addr}.")
+# Confirmed -> Shipped after a day, Shipped -> Delivered on the promised delivery date
+status_scheduler = OrderStatusScheduler(
+    orders, orders_lock, on_order_status_change,
+    ship_after=timedelta(hours=float(os.getenv("ORDER_SHIP_AFTER_HOURS", 24))),
+    deliver_after=timedelta(days=3)
+)
+if int(os.getenv("ORDER_STATUS_INTERVAL", 60)) > 0:
+    status_scheduler.start(interval=int(os.getenv("ORDER_STATUS_INTERVAL", 60)))
 
-    user_input = request.json.get('message', '').strip()
-    if not user_input:
-        logging.warning(f"Empty message received from {request.remote_addr}.")
-        return jsonify({"error": "Please enter a valid question."})
 
-    user_input_lower = user_input.lower()
-    logging.info(f"User {request.remote_addr} asked: '{user_input}'")
+def sync_orders():
+    """Pick up orders placed by other workers since the last sync"""
+    with orders_lock:
+        for order_id in order_store.refresh(orders):
+            status_scheduler.schedule(order_id)
+            order_index.add(order_id, orders[order_id])
 
-    bot_response = None  # Initialize bot_response to None
 
-    # Handle cases where Gemini model might not be initialized
-    if model is None:
-        logging.error(f"Gemini model not initialized for {request.remote_addr}. Cannot process AI requests.")
-        return jsonify({
-            "response": "Sorry, the chatbot is currently experiencing technical difficulties. "
-                        "Please try again later or contact support directly.",
-            "suggestions": [
-                "Ask about products",
-                "Try 'order sunscreen'",
-                "Track with 'where is order BEAUTY1234?'"
-            ]
-        }), 500
-
-    # --- Order Tracking ---
-    if any(keyword in user_input_lower for keyword in ["track", "where is", "status"]):
-        order_id = None
-        words = user_input.split()
-        for word in words:
-            if word.upper().startswith("BEAUTY") and word[6:].isdigit():
-                order_id = word.upper()
-                break
-        if order_id in orders:
-            update_order_status()
-            order = orders[order_id]
-            status_icons = {"Confirmed": "🟡", "Shipped": "🚚", "Delivered": "✅"}
-            bot_response = (
-                f"{status_icons.get(order['status'], '🟠')} Order #{order_id}\n"
-                f"📦 Product: {order['product']}\n"
-                f"🔄 Status: {order['status']}\n"
-                f"📅 Delivery: {order['delivery_date']}"
-            )
-            if order["status"] == "Delivered":
-                bot_response += "\n🎉 Your order has been delivered!"
-            logging.info(f"[{request.remote_addr}] Processed order tracking for {order_id}. Status: {order['status']}")
-        else:
-            bot_response = f"❌ Order {order_id or '#'} not found. Please check your order ID."
-            logging.warning(f"[{request.remote_addr}] Order tracking failed for ID: {order_id}. Not found.")
-
-    # --- Order Placement ---
-    elif any(keyword in user_input_lower for keyword in ["order", "buy", "purchase"]):
-        product_found = False
-        for key, product_data in PRODUCTS.items(): # Iterate with key and value
-            # Check for full product name match or "1) Product Name" match
-            if product_data["name"].lower() in user_input_lower or key.lower() in user_input_lower:
-                product = key # Store the PRODUCTS dict key for easy lookup
-                product_found = True
-                break
+def update_order_status(order_id):
+    """Bring a single order's status up to date before it is shown"""
+    return status_scheduler.refresh(order_id)
 
-        if product_found:
-            if PRODUCTS[product]["stock"] <= 0:
-                bot_response = f"❌ {PRODUCTS[product]['name']} is out of stock!"
-                logging.warning(f"[{request.remote_addr}] Attempted to order out of stock product: {PRODUCTS[product]['name']}")
-            else:
-                order_id = generate_order_id()
+
+# Rebuilt by apply_catalog() when the FAQ table changes
+faq_index = FAQIndex(FAQS, cutoff=0.6)
+
+# Catalog replies and FAQ answers, formatted and JSON/SSE-encoded ahead of time
+renderer = ResponseRenderer(PRODUCTS, FAQS, encode_json=lambda payload: app.json.response(payload).get_data(),
+                            encode_sse=sse_event, get_stocks=shared_state.get_stocks)
+STATUS_ICONS = {"Confirmed": "🟡", "Shipped": "🚚", "Delivered": "✅"}
+TRACKING_REPLY = "{icon} Order #{order_id}\n📦 Product: {product}\n🔄 Status: {status}\n📅 Delivery: {delivery_date}"
+
+
+# Intents in priority order; messages matching none of them go to the FAQ handler
+router = IntentRouter(
+    intents=[
+        ("track", ["track", "where is", "status"]),
+        ("order", ["order", "buy", "purchase"]),
+        ("catalog", ["products", "what do you sell"]),
+    ],
+    products=PRODUCTS,
+    default_intent="faq"
+)
+
+
+@router.handler("track")
+def handle_tracking(route):
+    order_id = route.order_id
+    if order_id and order_id not in orders:
+        sync_orders()  # May have been placed through another worker
+    if order_id in orders:
+        order = update_order_status(order_id)
+        bot_response = TRACKING_REPLY.format(icon=STATUS_ICONS.get(order['status'], '🟠'), order_id=order_id,
+                                             product=order['product'], status=order['status'],
+                                             delivery_date=order['delivery_date'])
+        if order["status"] == "Delivered":
+            bot_response += "\n🎉 Your order has been delivered!"
+        orders_log.info("[%s] Processed order tracking for %s. Status: %s", request.remote_addr, order_id, order['status'])
+    else:
+        bot_response = f"❌ Order {order_id or '#'} not found. Please check your order ID."
+        orders_log.warning("[%s] Order tracking failed for ID: %s. Not found.", request.remote_addr, order_id)
+    return bot_response
+
+
+@router.handler("order")
+def handle_order(route):
+    product = route.product_key # PRODUCTS dict key of the first product mentioned
+    if product not in PRODUCTS:
+        product = None # Routed just before a catalog reload removed it
+    if product:
+        remaining_stock = shared_state.reserve_stock(product)
+        if remaining_stock is None:
+            PRODUCTS[product]["stock"] = 0
+            renderer.refresh()
+            bot_response = f"❌ {PRODUCTS[product]['name']} is out of stock!"
+            orders_log.warning("[%s] Attempted to order out of stock product: %s", request.remote_addr, PRODUCTS[product]['name'])
+        else:
+            with orders_lock:
+                try:
+                    order_id = generate_order_id()
+                except RuntimeError:
+                    shared_state.release_stock(product) # No ID to sell it under (all shards taken)
+                    raise
                 delivery_date = create_delivery_date()
 
                 orders[order_id] = {
@@ -365,85 +344,271 @@ def chat():
                     "delivery_date": delivery_date,
                     "timestamp": datetime.now().isoformat()
                 }
-                PRODUCTS[product]["stock"] -= 1
-                save_orders()
-
-                bot_response = (
-                    f"✅ Order #{order_id} Confirmed!\n"
-                    f"📦 {PRODUCTS[product]['name']}\n"
-                    f"💳 ₹{PRODUCTS[product]['price']}\n"
-                    f"📅 Estimated Delivery: {delivery_date}\n"
-                    f"🔗 Track with: 'Where is order {order_id}?'"
-                )
-                logging.info(f"[{request.remote_addr}] Order placed: #{order_id} for {PRODUCTS[product]['name']}")
-        else:
-            available = "\n".join([f"- {p} (₹{PRODUCTS[p]['price']})" for p in PRODUCTS.values()]) # Show names
+                PRODUCTS[product]["stock"] = remaining_stock
+            # Only the ID and the insert need the lock; the fsynced append must not hold up other orders
+            save_order(order_id)
+            status_scheduler.schedule(order_id)
+            order_index.add(order_id, orders[order_id])
+            if remaining_stock == 0:
+                renderer.refresh()
+
             bot_response = (
-                f"Sorry, I couldn't find the product in your request.\n"
-                f"Available products:\n{available}\n"
-                f"Say 'order [product name]' to place an order."
+                f"✅ Order #{order_id} Confirmed!\n"
+                f"📦 {PRODUCTS[product]['name']}\n"
+                f"💳 ₹{PRODUCTS[product]['price']}\n"
+                f"📅 Estimated Delivery: {delivery_date}\n"
+                f"🔗 Track with: 'Where is order {order_id}?'"
             )
-            logging.warning(f"[{request.remote_addr}] Order placement failed. Product not found in input: '{user_input}'")
-
-    # --- FAQ System ---
-    elif "products" in user_input_lower or "what do you sell" in user_input_lower:
-        available = "\n".join([f"- {v['name']} (₹{v['price']})" for v in PRODUCTS.values()]) # Show names and prices
-        bot_response = f"Available products:\n{available}"
-        logging.info(f"[{request.remote_addr}] Responded to 'products you sell' query.")
-
-    elif any(user_input_lower == q.lower() for q in FAQS):  # Check for exact FAQ match
-        original_key = next(q for q in FAQS if q.lower() == user_input_lower)
-        bot_response = FAQS[original_key]
-        logging.info(f"[{request.remote_addr}] Responded to exact FAQ: '{original_key}'")
-
-    else:  # This 'else' block will catch everything that wasn't an order or exact FAQ match
-        matches = get_close_matches(user_input_lower, [q.lower() for q in FAQS.keys()], n=1, cutoff=0.6)
-        if matches:
-            original_key = next(q for q in FAQS if q.lower() == matches[0])
-            bot_response = FAQS[original_key]
-            logging.info(f"[{request.remote_addr}] Responded to fuzzy FAQ match: '{original_key}'")
+            orders_log.info("[%s] Order placed: #%s for %s", request.remote_addr, order_id, PRODUCTS[product]['name'])
+    else:
+        bot_response = renderer.unknown_product_reply
+        orders_log.warning("[%s] Order placement failed. Product not found in input: '%s'", request.remote_addr, route.text)
+    return bot_response
+
+
+@router.handler("catalog")
+def handle_catalog(route):
+    chat_log.info("[%s] Responded to 'products you sell' query.", request.remote_addr)
+    return renderer.catalog_reply
+
+
+@router.handler("faq")
+def handle_faq(route):
+    user_input_lower = route.text.lower()
+    index = faq_index # The index and its FAQ table are replaced together on catalog reload
+    if original_key := index.exact_key(user_input_lower):  # Check for exact FAQ match
+        g.branch = "faq_exact"
+        chat_log.info("[%s] Responded to exact FAQ: '%s'", request.remote_addr, original_key)
+        return index.faqs[original_key]
+    if original_key := index.fuzzy_key(user_input_lower):
+        g.branch = "faq_fuzzy"
+        chat_log.info("[%s] Responded to fuzzy FAQ match: '%s'", request.remote_addr, original_key)
+        return index.faqs[original_key]
+    return None
+
+
+def answer_locally(user_input):
+    """Tracking, ordering, catalog and FAQ answers. Returns None when only Gemini can answer."""
+    route = router.route(user_input)
+    g.branch = route.intent # Handlers refine this (e.g. faq_exact / faq_fuzzy) for /metrics
+    return router.dispatch(route)
+
+
+def product_lookup(products):
+    """Lowercased PRODUCTS keys and product names -> PRODUCTS key"""
+    lookup = {}
+    for key, product in products.items():
+        lookup.setdefault(key.lower(), key)
+        lookup.setdefault(product["name"].lower(), key)
+    return lookup
+
+
+PRODUCT_LOOKUP = product_lookup(PRODUCTS)
+
+
+def apply_catalog(products, faqs, products_changed, faqs_changed):
+    """Swap in a reloaded catalog, rebuilding only what derives from the parts that changed.
+
+    Runs on the catalog watcher thread. Each derived index is built aside and
+    then published by rebinding one name, so requests never see a half-built one.
+    """
+    global PRODUCTS, FAQS, PRODUCT_LOOKUP, faq_index
+    if products_changed:
+        sync_stock(products)
+        PRODUCTS = products
+        router.rebuild(products)
+        PRODUCT_LOOKUP = product_lookup(products)
+        renderer.products = products
+    if faqs_changed:
+        faq_index = FAQIndex(faqs, cutoff=0.6)
+        FAQS = faqs
+        renderer.rebuild_faqs(faqs)
+    elif products_changed:
+        renderer.refresh()
+    logging.info(f"Catalog reloaded: {len(PRODUCTS)} products, {len(FAQS)} FAQ questions "
+                 f"(products {'changed' if products_changed else 'unchanged'}, "
+                 f"FAQs {'changed' if faqs_changed else 'unchanged'})")
+
+
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", 5))
+if CATALOG_RELOAD_INTERVAL > 0:
+    catalog.start(apply_catalog, interval=CATALOG_RELOAD_INTERVAL)
+
+
+def conversation_id():
+    """Server-side conversation key; the signed cookie only carries this ID"""
+    # Sessions from before server-side history still carry it in the cookie; drop it
+    if 'history' in session:
+        session.pop('history')
+    sid = session.get('sid')
+    if not sid:
+        sid = session['sid'] = conversations.new_id()
+        chat_log.info("Conversation %s started for %s.", sid, request.remote_addr)
+    return sid
+
+
+def build_gemini_request(user_input, fingerprint):
+    """Chat history and prompt for a Gemini fallback call"""
+    sid = conversation_id()
+    gemini_history, prompt = context_builder.build(
+        user_input, conversations.history(sid), PRODUCTS, fingerprint, summary=conversations.summary(sid))
+    GEMINI_PROMPT_TOKENS.observe(context_builder.tokens(gemini_history, prompt))
+    return gemini_history, prompt
+
+
+def ask_gemini(user_input, fingerprint):
+    """Blocking Gemini fallback call; always returns a user-facing string"""
+    try:
+        gemini_history, prompt = build_gemini_request(user_input, fingerprint)
+
+        gemini_log.info("[%s] Attempting Gemini API call for user input: '%s'", request.remote_addr, user_input)
+        gemini_log.debug("[%s] Prompt sent to Gemini: %s", request.remote_addr, prompt)
+
+        with GEMINI_LATENCY.time("blocking"):
+            response_obj = gemini_client.generate(gemini_history, prompt, g.deadline)
+
+        if response_obj and hasattr(response_obj, 'text') and response_obj.text:
+            GEMINI_CALLS.inc("ok")
+            bot_response = response_obj.text.strip()[:500] # Trim response to 500 chars
+            response_cache.put(user_input, fingerprint, bot_response)
+            gemini_log.info("[%s] Gemini API call successful. Bot response: '%s'", request.remote_addr, bot_response)
         else:
-            # --- Gemini Fallback (ONLY REACHED IF NO OTHER CONDITIONS MET) ---
-            if model: # Check if model was successfully initialized
-                try:
-                    # Construct chat history for Gemini
-                    gemini_history = []
-                    for entry in session['history'][-5:]: # Use last 5 turns for context
-                        if "user" in entry and "bot" in entry:
-                            gemini_history.append({"role": "user", "parts": [entry["user"]]})
-                            gemini_history.append({"role": "model", "parts": [entry["bot"]]})
-
-                    prompt = f"""You are BeautyBot, an e-commerce chatbot for a skincare store.
-                    Your goal is to answer questions about skincare, recommend products, and assist with orders.
-                    Keep responses concise, helpful, and under 3 sentences.
-                    Do not provide information about products not listed in the provided PRODUCTS list.
-                    Do not make up order IDs or product names.
-                    Current products available: {list(PRODUCTS.keys())}.
-
-                    User Query: {user_input}
-                    """
-                    # Start a new chat session with the history
-                    chat_session = model.start_chat(history=gemini_history)
-
-                    logging.info(f"[{request.remote_addr}] Attempting Gemini API call for user input: '{user_input}'")
-                    logging.debug(f"[{request.remote_addr}] Prompt sent to Gemini: {prompt}")
-
-                    response_obj = chat_session.send_message(prompt, request_options={"timeout": 60})
-
-                    if response_obj and hasattr(response_obj, 'text') and response_obj.text:
-                        bot_response = response_obj.text.strip()[:500] # Trim response to 500 chars
-                        logging.info(f"[{request.remote_addr}] Gemini API call successful. Bot response: '{bot_response}'")
-                    else:
-                        bot_response = "I received an empty or unreadable response from the AI. Please try again."
-                        logging.warning(
-                            f"[{request.remote_addr}] Gemini API returned empty/unreadable response for input: '{user_input}'")
-
-                except Exception as e:
-                    logging.error(f"[{request.remote_addr}] Gemini API Error for input '{user_input}': {e}", exc_info=True)
-                    bot_response = "Sorry, I am unable to connect to the AI at the moment. Please try again later."
-            else:
-                bot_response = "The AI model is not available. Please contact support if the problem persists."
-                logging.error(f"[{request.remote_addr}] Gemini model not initialized, cannot serve AI fallback.")
+            GEMINI_CALLS.inc("empty")
+            bot_response = "I received an empty or unreadable response from the AI. Please try again."
+            gemini_log.warning(
+                "[%s] Gemini API returned empty/unreadable response for input: '%s'", request.remote_addr, user_input)
+
+    except GeminiUnavailable as e:
+        GEMINI_CALLS.inc(e.reason)
+        g.branch = "gemini_degraded"
+        gemini_log.warning("[%s] Gemini call skipped (%s); answering locally.", request.remote_addr, e.reason)
+        bot_response = degraded_answer(user_input)
+    except Exception as e:
+        GEMINI_CALLS.inc("timeout" if is_timeout(e) else "error")
+        gemini_log.error("[%s] Gemini API Error for input '%s': %s", request.remote_addr, user_input, e, exc_info=True)
+        bot_response = "Sorry, I am unable to connect to the AI at the moment. Please try again later."
+    return bot_response
+
+
+def stream_gemini(user_input, fingerprint, remote_addr, deadline):
+    """Yield Gemini text chunks as they arrive, capped at the same 500 chars as ask_gemini()"""
+    gemini_history, prompt = build_gemini_request(user_input, fingerprint)
+    gemini_log.info("[%s] Attempting streaming Gemini API call for user input: '%s'", remote_addr, user_input)
+
+    sent = ""
+    started = time.perf_counter()
+    chunks = gemini_client.stream(gemini_history, prompt, deadline)
+    try:
+        for chunk in chunks:
+            text = getattr(chunk, "text", "") or ""
+            if not sent:
+                text = text.lstrip()
+            text = text[:500 - len(sent)]
+            if text:
+                sent += text
+                yield text
+            if len(sent) >= 500:
+                break
+    except GeminiUnavailable as e:
+        GEMINI_CALLS.inc(e.reason)
+        gemini_log.warning("[%s] Gemini streaming call skipped (%s); answering locally.", remote_addr, e.reason)
+        yield degraded_answer(user_input)
+        return
+    except Exception as e:
+        GEMINI_CALLS.inc("timeout" if is_timeout(e) else "error")
+        GEMINI_LATENCY.observe(time.perf_counter() - started, "stream")
+        gemini_log.error("[%s] Gemini streaming error for input '%s': %s", remote_addr, user_input, e, exc_info=True)
+        if not sent:
+            yield "Sorry, I am unable to connect to the AI at the moment. Please try again later."
+        return
+    finally:
+        chunks.close() # Frees the Gemini slot when the 500 char cap stops reading early
+
+    GEMINI_LATENCY.observe(time.perf_counter() - started, "stream")
+    GEMINI_CALLS.inc("ok" if sent.strip() else "empty")
+    if sent.strip():
+        response_cache.put(user_input, fingerprint, sent.strip())
+        gemini_log.info("[%s] Gemini streaming call successful. Bot response: '%s'", remote_addr, sent.strip())
+    else:
+        gemini_log.warning("[%s] Gemini API returned empty streamed response for input: '%s'", remote_addr, user_input)
+        yield "I received an empty or unreadable response from the AI. Please try again."
+
+
+def degraded_answer(user_input):
+    """Local stand-in while Gemini calls are being rejected: a looser FAQ match, else the catalog"""
+    index = faq_index
+    original_key = index.fuzzy_key(user_input, cutoff=GEMINI_DEGRADED_FAQ_CUTOFF)
+    if original_key:
+        return index.faqs[original_key]
+    return ("Our skincare assistant is busy right now, so here is what we carry:\n"
+            f"{renderer.catalog_listing}\nAsk about a product by name, or try again in a minute.")
+
+
+def model_unavailable_response():
+    gemini_log.error("Gemini model not initialized for %s. Cannot process AI requests.", request.remote_addr)
+    return jsonify({
+        "response": "Sorry, the chatbot is currently experiencing technical difficulties. "
+                    "Please try again later or contact support directly.",
+        "suggestions": [
+            "Ask about products",
+            "Try 'order sunscreen'",
+            "Track with 'where is order BEAUTY1234?'"
+        ]
+    }), 500
+
+
+# --- Routes ---
+@app.route('/')
+def home():
+    chat_log.info("Request to home page from %s", request.remote_addr)
+    return render_template("index.html")
+
+
+@app.route('/metrics')
+@limiter.exempt
+def metrics():
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@app.route('/chat', methods=['POST'])
+@limiter.limit("5 per minute")
+def chat():
+    started = time.perf_counter()
+    g.deadline = time.monotonic() + GEMINI_REQUEST_BUDGET
+    SESSION_COOKIE_BYTES.observe(len(request.headers.get("Cookie", "")))
+    sid = conversation_id()
+
+    user_input = request.json.get('message', '').strip()
+    if not user_input:
+        chat_log.warning("Empty message received from %s.", request.remote_addr)
+        return jsonify({"error": "Please enter a valid question."})
+
+    chat_log.info("User %s asked: '%s'", request.remote_addr, user_input)
+
+    # Handle cases where Gemini model might not be initialized
+    if model is None:
+        return model_unavailable_response()
+
+    bot_response = answer_locally(user_input)
+    if bot_response is None:
+        # --- Gemini Fallback (ONLY REACHED IF NO OTHER CONDITIONS MET) ---
+        fingerprint = catalog_fingerprint(PRODUCTS)
+        cached_response = response_cache.get(user_input, fingerprint)
+        if cached_response:
+            g.branch = "gemini_cache"
+            bot_response = cached_response
+            gemini_log.info("[%s] Served Gemini fallback from response cache.", request.remote_addr)
+        elif model: # Check if model was successfully initialized
+            g.branch = "gemini"
+            bot_response = ask_gemini(user_input, fingerprint)
+        else:
+            bot_response = "The AI model is not available. Please contact support if the problem persists."
+            gemini_log.error("[%s] Gemini model not initialized, cannot serve AI fallback.", request.remote_addr)
 
     # Ensure bot_response is always a string
     if not isinstance(bot_response, str):
@@ -453,19 +618,201 @@ def chat():
             bot_response = bot_response["error"] + ". " + " ".join(bot_response.get("suggestions", []))
         else:
             bot_response = "Sorry, I couldn't process that request."
-            logging.error(f"[{request.remote_addr}] bot_response was not a string or expected dict: {bot_response}")
+            chat_log.error("[%s] bot_response was not a string or expected dict: %s", request.remote_addr, bot_response)
 
 
     # Log the final response before sending
-    logging.info(f"[{request.remote_addr}] Final bot response: {bot_response[:100]}...") # Log first 100 chars
+    chat_log.info("[%s] Final bot response: %.100s...", request.remote_addr, bot_response) # Log first 100 chars
 
-    # Append to session history (using consistent keys 'user' and 'bot')
-    session['history'].append({"user": user_input, "bot": bot_response})
-    session.modified = True # Important: tell Flask that session has been modified
+    # Append to the server-side history (using consistent keys 'user' and 'bot')
+    conversations.append(sid, user_input, bot_response)
 
+    CHAT_LATENCY.observe(time.perf_counter() - started, g.branch)
+    rendered = renderer.rendered(bot_response)
+    if rendered:
+        response = app.response_class(rendered.json_body, mimetype="application/json")
+        response.set_etag(rendered.etag)
+        return response
     return jsonify({"response": bot_response})
 
 
+@app.route('/chat/stream', methods=['POST'])
+@limiter.limit("5 per minute")
+def chat_stream():
+    """Same answers as /chat, sent as server-sent events so Gemini output renders as it arrives.
+
+    Events are {"delta": text} chunks followed by {"done": true, "response": full_text}.
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + GEMINI_REQUEST_BUDGET
+    SESSION_COOKIE_BYTES.observe(len(request.headers.get("Cookie", "")))
+    sid = conversation_id()
+
+    user_input = request.json.get('message', '').strip()
+    if not user_input:
+        chat_log.warning("Empty message received from %s.", request.remote_addr)
+        return jsonify({"error": "Please enter a valid question."})
+
+    chat_log.info("User %s asked (stream): '%s'", request.remote_addr, user_input)
+
+    if model is None:
+        return model_unavailable_response()
+
+    bot_response = answer_locally(user_input)
+    fingerprint = catalog_fingerprint(PRODUCTS)
+    if bot_response is None:
+        bot_response = response_cache.get(user_input, fingerprint)
+        g.branch = "gemini_cache"
+
+    if bot_response is not None:
+        conversations.append(sid, user_input, bot_response)
+        CHAT_LATENCY.observe(time.perf_counter() - started, g.branch)
+        rendered = renderer.rendered(bot_response)
+        body = rendered.sse_body if rendered else (
+            sse_event({"delta": bot_response}) + sse_event({"done": True, "response": bot_response}))
+        return Response(body, mimetype="text/event-stream")
+
+    chunks = stream_gemini(user_input, fingerprint, request.remote_addr, deadline)
+
+    def generate():
+        full_text = ""
+        for text in chunks:
+            full_text += text
+            yield sse_event({"delta": text})
+        # History is server-side, so the streamed turn can be recorded after the headers went out
+        conversations.append(sid, user_input, full_text.strip())
+        CHAT_LATENCY.observe(time.perf_counter() - started, "gemini_stream")
+        yield sse_event({"done": True, "response": full_text.strip()})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --- Batch API (storefront and support tooling) ---
+# Bulk lookups share one rate limit of their own instead of spending the /chat budget.
+BATCH_RATE_LIMIT = os.getenv("BATCH_RATE_LIMIT", "60 per minute")
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 500))
+batch_limit = limiter.shared_limit(BATCH_RATE_LIMIT, scope="batch")
+
+
+def batch_ids(field):
+    """Validated list of strings from the JSON body, or (error response, status)"""
+    ids = (request.get_json(silent=True) or {}).get(field)
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        return None, (jsonify({"error": f"'{field}' must be a list of strings."}), 400)
+    if len(ids) > BATCH_MAX_ITEMS:
+        return None, (jsonify({"error": f"At most {BATCH_MAX_ITEMS} {field} per request."}), 400)
+    return ids, None
+
+
+def order_record(order_id):
+    order = update_order_status(order_id)
+    return dict(order, order_id=order_id) if order is not None else None
+
+
+@app.route('/api/orders/status', methods=['POST'])
+@batch_limit
+def orders_status_batch():
+    """{"order_ids": [...]} -> current status of each order, keyed by the IDs exactly as sent"""
+    requested, error = batch_ids("order_ids")
+    if error:
+        return error
+    order_ids = [order_id.strip().upper() for order_id in requested]
+    if any(order_id not in orders for order_id in order_ids):
+        sync_orders()  # Some may have been placed through another worker
+
+    found, not_found = {}, []
+    for sent, order_id in zip(requested, order_ids):
+        record = order_record(order_id) if order_id in orders else None
+        if record is None:
+            not_found.append(sent)
+        else:
+            found[sent] = record
+    orders_log.info("[%s] Batch status lookup: %d found, %d not found", request.remote_addr, len(found), len(not_found))
+    return jsonify({"orders": found, "not_found": not_found})
+
+
+@app.route('/api/products/stock', methods=['POST'])
+@batch_limit
+def products_stock_batch():
+    """{"product_keys": [...]} (PRODUCTS keys or product names; omit for all) -> price and live stock"""
+    if "product_keys" in (request.get_json(silent=True) or {}):
+        product_keys, error = batch_ids("product_keys")
+        if error:
+            return error
+    else:
+        product_keys = list(PRODUCTS)
+
+    found, not_found = {}, []
+    for requested in product_keys:
+        key = PRODUCT_LOOKUP.get(requested.strip().lower())
+        if key is None:
+            not_found.append(requested)
+            continue
+        stock = shared_state.get_stock(key)
+        found[key] = {"name": PRODUCTS[key]["name"], "price": PRODUCTS[key]["price"],
+                      "stock": stock if stock is not None else PRODUCTS[key]["stock"]}
+    return jsonify({"products": found, "not_found": not_found})
+
+
+def static_document(body, etag):
+    """Pre-encoded JSON with an ETag; answers If-None-Match with 304 Not Modified"""
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True # Clients may keep it but must revalidate
+    return response.make_conditional(request)
+
+
+@app.route('/api/catalog', methods=['GET'])
+@batch_limit
+def catalog_document():
+    """Product keys, names, prices and availability"""
+    renderer.refresh() # Another worker may have sold the last unit; availability comes from the shared stock
+    return static_document(renderer.catalog_body, renderer.catalog_etag)
+
+
+@app.route('/api/faqs', methods=['GET'])
+@batch_limit
+def faqs_document():
+    return static_document(renderer.faqs_body, renderer.faqs_etag)
+
+
+@app.route('/api/orders', methods=['GET'])
+@batch_limit
+def orders_by_date():
+    """Orders placed between ?from= and ?to= (ISO dates, to inclusive), oldest first.
+
+    JSON pages of ?limit= orders with a next_cursor to pass back as ?cursor=,
+    or every match as NDJSON with ?format=ndjson (or Accept: application/x-ndjson).
+    """
+    try:
+        start = range_bound(request.args.get("from"))
+        end = range_bound(request.args.get("to"), end=True)
+        limit = max(1, min(int(request.args.get("limit", 100)), BATCH_MAX_ITEMS))
+    except ValueError:
+        return jsonify({"error": "Use ISO dates (YYYY-MM-DD) for from/to and an integer limit."}), 400
+    cursor = request.args.get("cursor") or None
+    sync_orders()
+    if cursor is not None and cursor not in order_index:
+        return jsonify({"error": "Unknown cursor; pass back a next_cursor from an earlier page."}), 400
+
+    if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson":
+        def generate():
+            after = cursor
+            while True:
+                page = order_index.between(start, end, after=after, limit=BATCH_MAX_ITEMS)
+                if not page:
+                    return
+                yield "".join(json.dumps(order_record(order_id)) + "\n" for order_id in page)
+                after = page[-1]
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    page = order_index.between(start, end, after=cursor, limit=limit + 1)
+    next_cursor = page[limit - 1] if len(page) > limit else None
+    return jsonify({"orders": [order_record(order_id) for order_id in page[:limit]], "next_cursor": next_cursor})
+
+
 # --- Run App ---
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,195 @@
+"""Load test for /chat against a stubbed Gemini backend.
+
+Runs app.py in-process (Flask test client, one client per conversation) inside
+a scratch directory seeded with a synthetic orders.json, replays a seeded
+workload from a thread pool and reports throughput plus p50/p95/p99 latency
+for each branch that answered (track, order, faq_exact, faq_fuzzy, gemini...).
+
+    python benchmarks/bench_chat.py --orders 50000 --faqs 2000 --messages 5000 --threads 16
+    python benchmarks/bench_chat.py --save-workload w.jsonl ...   # record
+    python benchmarks/bench_chat.py --workload w.jsonl ...        # replay
+    python benchmarks/bench_chat.py --json after.json --baseline before.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from fake_gemini import FakeGenerativeModel  # noqa: E402
+import workload as workloads  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_seconds):
+    """samples: list of (branch, seconds) -> report dict"""
+    by_branch = {}
+    for branch, seconds in samples:
+        by_branch.setdefault(branch, []).append(seconds)
+    by_branch["all"] = [seconds for _, seconds in samples]
+    report = {"requests": len(samples), "wall_seconds": wall_seconds,
+              "throughput_rps": len(samples) / wall_seconds if wall_seconds else 0.0, "branches": {}}
+    for branch, values in sorted(by_branch.items()):
+        values.sort()
+        report["branches"][branch] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"{report['requests']} requests in {report['wall_seconds']:.2f}s "
+          f"-> {report['throughput_rps']:.1f} req/s")
+    print(f"{'branch':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for branch, row in report["branches"].items():
+        line = (f"{branch:<14}{row['count']:>8}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+                f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+        before = (baseline or {}).get("branches", {}).get(branch)
+        if before and before["p95_ms"]:
+            line += f"   p95 {100.0 * (row['p95_ms'] - before['p95_ms']) / before['p95_ms']:+.1f}%"
+        print(line)
+    if baseline and baseline.get("throughput_rps"):
+        change = 100.0 * (report["throughput_rps"] - baseline["throughput_rps"]) / baseline["throughput_rps"]
+        print(f"throughput {change:+.1f}% vs baseline")
+
+
+def load_app(scratch_dir, orders, args):
+    """Import app.py with its working files redirected into scratch_dir"""
+    with open(os.path.join(scratch_dir, "orders.json"), "w", encoding="utf-8") as f:
+        json.dump(orders, f)
+    os.environ.update({
+        "GEMINI_API_KEY": "",
+        "FLASK_SECRET_KEY": "bench",
+        "LOG_DIR": os.path.join(scratch_dir, "logs"),
+        "LOG_LEVEL": args.log_level,
+        "ORDER_STORE": args.order_store,
+        "ORDERS_FSYNC": "1" if args.fsync else "0",
+        "ORDER_STATUS_INTERVAL": "0",
+        "SHARED_STATE_URL": "memory://",
+        "CATALOG_FILE": os.path.join(REPO_DIR, "catalog.json"),
+        "CATALOG_RELOAD_INTERVAL": "0",
+    })
+    os.chdir(scratch_dir)
+    import app as app_module
+
+    app_module.model = FakeGenerativeModel(latency_ms=args.gemini_latency_ms, failure_rate=args.gemini_failure_rate,
+                                           timeout_rate=args.gemini_timeout_rate, seed=args.seed)
+    app_module.gemini_client.model = app_module.model
+    app_module.limiter.enabled = False
+    app_module.app.config["TESTING"] = True
+    for key in app_module.PRODUCTS:  # keep "order" requests on the reservation path instead of out-of-stock
+        app_module.shared_state.release_stock(key, 10 ** 6)
+    if args.faqs:
+        app_module.apply_catalog(app_module.PRODUCTS, workloads.synthetic_faqs(args.faqs, seed=args.seed),
+                                 products_changed=False, faqs_changed=True)
+    return app_module
+
+
+def run(app_module, items, threads):
+    branch_seen = threading.local()
+
+    @app_module.app.teardown_request
+    def record_branch(exc):
+        branch_seen.value = app_module.g.get("branch", "none")
+
+    clients = {}
+    clients_lock = threading.Lock()
+
+    def client_for(conversation):
+        # One cookie jar per conversation; a test client is not shared across threads at once
+        with clients_lock:
+            entry = clients.get(conversation)
+            if entry is None:
+                entry = clients[conversation] = (app_module.app.test_client(), threading.Lock())
+            return entry
+
+    def send(item):
+        client, lock = client_for(item["conversation"])
+        with lock:
+            started = time.perf_counter()
+            resp = client.post("/chat", json={"message": item["message"]})
+            elapsed = time.perf_counter() - started
+        branch = getattr(branch_seen, "value", "none")
+        if resp.status_code != 200:
+            branch = f"http_{resp.status_code}"
+        return branch, elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(send, items))
+    return samples, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=10000, help="synthetic orders in orders.json")
+    parser.add_argument("--faqs", type=int, default=0, help="synthetic FAQ entries (0 keeps app.FAQS)")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", help="branch weights, e.g. track=0.3,faq_fuzzy=0.5,gemini=0.2")
+    parser.add_argument("--workload", help="replay a workload saved with --save-workload")
+    parser.add_argument("--save-workload")
+    parser.add_argument("--gemini-latency-ms", type=float, default=50)
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-timeout-rate", type=float, default=0.0)
+    parser.add_argument("--order-store", choices=["journal", "sqlite"], default="journal")
+    parser.add_argument("--fsync", action="store_true", help="fsync journal appends, as in production")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report from an earlier run to compare against")
+    args = parser.parse_args()
+    for name in ("workload", "save_workload", "json", "baseline"):  # app.py runs from a scratch directory
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    orders = workloads.synthetic_orders(args.orders, seed=args.seed)
+    launch_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="beautybot-bench-") as scratch_dir:
+        app_module = load_app(scratch_dir, orders, args)
+        if args.workload:
+            items = workloads.load_workload(args.workload)
+        else:
+            mix = {k: float(v) for k, v in (p.split("=") for p in args.mix.split(","))} if args.mix else None
+            items = workloads.conversation_workload(args.messages, orders, app_module.FAQS, mix=mix,
+                                                    seed=args.seed, conversations=args.conversations)
+        if args.save_workload:
+            workloads.save_workload(items, args.save_workload)
+
+        samples, wall_seconds = run(app_module, items, args.threads)
+        app_module.order_store.close()
+        os.chdir(launch_dir)
+
+    report = summarize(samples, wall_seconds)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}
+    report["gemini_calls"] = app_module.model.calls
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Microbenchmarks for the matching and persistence paths behind /chat.
+
+    python benchmarks/bench_micro.py                 # everything
+    python benchmarks/bench_micro.py faq router      # selected groups
+    python benchmarks/bench_micro.py --faqs 5000 --orders 100000
+
+Each line is the median per-call time over --repeat rounds; the difflib /
+full-rewrite rows are the pre-index baselines the current code replaced.
+"""
+from difflib import get_close_matches
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from conversation_store import ConversationStore  # noqa: E402
+from faq_index import FAQIndex  # noqa: E402
+from intent_router import IntentRouter  # noqa: E402
+from order_store import open_order_store  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+import workload as workloads  # noqa: E402
+
+PRODUCTS = {f"{i + 1}) {name}": {"name": name, "price": 399, "stock": 50}
+            for i, name in enumerate(workloads.PRODUCT_NAMES)}
+
+
+def measure(label, fn, items, repeat):
+    """Median seconds per item over `repeat` passes of fn(item) for item in items"""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            fn(item)
+        rounds.append((time.perf_counter() - started) / len(items))
+    per_call = statistics.median(rounds)
+    print(f"  {label:<44}{per_call * 1e6:>12.2f} us/op{1 / per_call:>14.0f} op/s")
+    return {label: per_call}
+
+
+def bench_faq(args, rng):
+    faqs = workloads.synthetic_faqs(args.faqs, seed=args.seed)
+    keys = list(faqs)
+    lowered = [k.strip().lower() for k in keys]
+    queries = [workloads.typo(rng.choice(lowered), rng) for _ in range(args.queries)]
+    print(f"faq ({len(faqs)} entries, {len(queries)} fuzzy queries)")
+    results = {}
+    started = time.perf_counter()
+    index = FAQIndex(faqs, cutoff=0.6)
+    print(f"  {'FAQIndex build':<44}{(time.perf_counter() - started) * 1e3:>12.2f} ms")
+    results.update(measure("FAQIndex.exact_key", index.exact_key, lowered[:args.queries], args.repeat))
+    results.update(measure("FAQIndex.fuzzy_key", index.fuzzy_key, queries, args.repeat))
+    if len(faqs) <= args.difflib_limit:
+        results.update(measure("difflib.get_close_matches (baseline)",
+                               lambda q: get_close_matches(q, lowered, n=1, cutoff=0.6), queries, args.repeat))
+    return results
+
+
+def bench_router(args, rng):
+    router = IntentRouter(
+        intents=[("track", ["track", "where is", "status"]),  # same keywords as app.py
+                 ("order", ["order", "buy", "purchase"]),
+                 ("catalog", ["products", "what do you sell"])],
+        products=PRODUCTS, default_intent="faq")
+    orders = workloads.synthetic_orders(1000, seed=args.seed)
+    faqs = workloads.synthetic_faqs(200, seed=args.seed)
+    messages = [item["message"] for item in
+                workloads.conversation_workload(args.queries, orders, faqs, seed=args.seed)]
+    print(f"router ({len(messages)} mixed messages)")
+    return measure("IntentRouter.route", router.route, messages, args.repeat)
+
+
+def bench_caches(args, rng):
+    print("caches")
+    results = {}
+    questions = [f"{q} {i}" for i, q in enumerate(workloads.AI_QUESTIONS * (args.queries // 9 + 1))][:args.queries]
+    cache = ResponseCache(max_entries=len(questions), ttl=3600, max_bytes=64 * 1024 * 1024)
+    for q in questions:
+        cache.put(q, "fp", "answer " + q)
+    results.update(measure("ResponseCache.get (hit)", lambda q: cache.get(q, "fp"), questions, args.repeat))
+    similar = ResponseCache(max_entries=1024, ttl=3600, max_bytes=64 * 1024 * 1024, similarity=0.9)
+    for q in questions[:1024]:
+        similar.put(q, "fp", "answer " + q)
+    misses = [q + " today?" for q in questions[:200]]
+    results.update(measure("ResponseCache.get (similarity scan, 1024)", lambda q: similar.get(q, "fp"),
+                           misses, args.repeat))
+    store = ConversationStore(max_turns=10)
+    sids = [f"sid{i}" for i in range(1000)]
+    turns = [(rng.choice(sids), q) for q in questions]
+    results.update(measure("ConversationStore.append", lambda t: store.append(t[0], t[1], "answer"),
+                           turns, args.repeat))
+    return results
+
+
+def bench_orders(args, rng):
+    orders = workloads.synthetic_orders(args.orders, seed=args.seed)
+    new_ids = [f"BEAUTY{900000 + i}" for i in range(args.writes)]
+    order = next(iter(orders.values()))
+    print(f"orders ({len(orders)} existing, {len(new_ids)} writes, fsync={'on' if args.fsync else 'off'})")
+    results = {}
+    scratch = tempfile.mkdtemp(prefix="beautybot-micro-")
+    try:
+        snapshot = os.path.join(scratch, "orders.json")
+        with open(snapshot, "w", encoding="utf-8") as f:
+            json.dump(orders, f)
+
+        for kind, kwargs in (("journal", {"snapshot_path": snapshot, "fsync": args.fsync,
+                                          "journal_path": os.path.join(scratch, "orders.journal.jsonl")}),
+                             ("sqlite", {"path": os.path.join(scratch, "orders.db"), "import_from": snapshot})):
+            store = open_order_store(kind, **kwargs)
+            started = time.perf_counter()
+            loaded = store.load()
+            print(f"  {kind + ' load':<44}{(time.perf_counter() - started) * 1e3:>12.2f} ms ({len(loaded)} orders)")
+            results.update(measure(f"{kind} put", lambda oid: store.put(oid, order), new_ids, 1))
+            results.update(measure(f"{kind} update", lambda oid: store.update(oid, {"status": "Shipped"}),
+                                   new_ids, 1))
+            store.close()
+
+        def rewrite(oid):
+            orders[oid] = order
+            with open(snapshot + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(orders, f, indent=4)
+            os.replace(snapshot + ".tmp", snapshot)
+        rewrites = new_ids[:max(1, min(len(new_ids), 2000000 // max(1, len(orders))))]
+        results.update(measure("full orders.json rewrite (baseline)", rewrite, rewrites, 1))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+GROUPS = {"faq": bench_faq, "router": bench_router, "caches": bench_caches, "orders": bench_orders}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("groups", nargs="*", help=f"any of: {', '.join(GROUPS)} (default: all)")
+    parser.add_argument("--faqs", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--difflib-limit", type=int, default=5000, help="skip the difflib baseline above this size")
+    parser.add_argument("--fsync", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write per-op seconds as JSON")
+    args = parser.parse_args()
+
+    unknown = set(args.groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in args.groups or list(GROUPS):
+        results.update(GROUPS[name](args, random.Random(args.seed)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
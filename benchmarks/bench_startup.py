@@ -0,0 +1,103 @@
+"""Cold-start benchmark: time to import app.py and answer a first FAQ message.
+
+Each run is a fresh interpreter in a scratch directory holding a synthetic
+orders.json, so it measures what a newly spawned (or resumed) worker pays
+before it can serve traffic. Runs cover each GEMINI_INIT mode and the order
+snapshot cache on/off; the first run of a cache-on config writes the cache.
+
+    python benchmarks/bench_startup.py --orders 50000 --repeat 5
+    python benchmarks/bench_startup.py --json startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.2   # exit 1 on regression
+    python benchmarks/bench_startup.py --max-seconds 1.0                        # absolute budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [BENCH_DIR]
+
+import workload as workloads  # noqa: E402
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.limiter.enabled = False
+response = app.app.test_client().post("/chat", json={"message": "Hi"})
+answered = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "first_response_s": answered - started,
+                  "status": response.status_code, "gemini_loaded": getattr(app.model, "loaded", None)}))
+"""
+
+
+def run_once(scratch_dir, env):
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", PROBE], cwd=scratch_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modes", default="lazy,eager", help="GEMINI_INIT values to compare")
+    parser.add_argument("--snapshot-cache", default="1,0", help="ORDERS_SNAPSHOT_CACHE values to compare")
+    parser.add_argument("--json", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--max-seconds", type=float, help="fail if the default config's median first response is slower")
+    args = parser.parse_args()
+
+    report = {"orders": args.orders, "configs": {}}
+    with tempfile.TemporaryDirectory(prefix="beautybot-startup-") as scratch_dir:
+        with open(os.path.join(scratch_dir, "orders.json"), "w", encoding="utf-8") as f:
+            json.dump(workloads.synthetic_orders(args.orders), f)
+
+        print(f"{'config':<28}{'import p50':>12}{'first p50':>12}{'first max':>12}")
+        for mode in args.modes.split(","):
+            for cache in args.snapshot_cache.split(","):
+                env = dict(os.environ, PYTHONPATH=REPO_DIR, GEMINI_API_KEY="bench-not-a-real-key", GEMINI_INIT=mode,
+                           ORDERS_SNAPSHOT_CACHE=cache, ORDER_STATUS_INTERVAL="0", CATALOG_RELOAD_INTERVAL="0",
+                           CATALOG_FILE=os.path.join(REPO_DIR, "catalog.json"), FLASK_SECRET_KEY="bench",
+                           LOG_DIR=os.path.join(scratch_dir, "logs"), SHARED_STATE_URL="memory://")
+                if cache != "0":
+                    run_once(scratch_dir, env)  # writes orders.json.cache
+                runs = [run_once(scratch_dir, env) for _ in range(args.repeat)]
+                imports = sorted(r["import_s"] for r in runs)
+                firsts = sorted(r["first_response_s"] for r in runs)
+                name = f"GEMINI_INIT={mode},cache={cache}"
+                report["configs"][name] = {"import_p50_s": statistics.median(imports),
+                                           "first_response_p50_s": statistics.median(firsts),
+                                           "first_response_max_s": firsts[-1]}
+                print(f"{name:<28}{statistics.median(imports):>11.3f}s{statistics.median(firsts):>11.3f}s"
+                      f"{firsts[-1]:>11.3f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for name, row in report["configs"].items():
+            before = baseline.get("configs", {}).get(name)
+            if before and row["first_response_p50_s"] > before["first_response_p50_s"] * (1 + args.tolerance):
+                failures.append(f"{name}: {row['first_response_p50_s']:.3f}s vs {before['first_response_p50_s']:.3f}s")
+    default = report["configs"].get("GEMINI_INIT=lazy,cache=1")
+    if args.max_seconds and default and default["first_response_p50_s"] > args.max_seconds:
+        failures.append(f"default config: {default['first_response_p50_s']:.3f}s > {args.max_seconds:.3f}s budget")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
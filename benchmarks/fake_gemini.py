@@ -0,0 +1,85 @@
+"""Offline stand-in for google.generativeai.GenerativeModel.
+
+Only the surface app.py uses is implemented: model_name, start_chat(history=...)
+and ChatSession.send_message(prompt, stream=..., request_options=...).
+"""
+import random
+import threading
+import time
+
+
+class FakeGeminiError(Exception):
+    pass
+
+
+class DeadlineExceeded(FakeGeminiError):
+    """Name matches the google.api_core exception so metrics.is_timeout() classifies it"""
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _ChatSession:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history or []
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        self.model._record_call()
+        timeout = (request_options or {}).get("timeout", 60)
+        latency = self.model._draw_latency()
+        roll = self.model._rng_random()
+        if roll < self.model.timeout_rate:
+            time.sleep(min(latency, timeout))
+            raise DeadlineExceeded("504 Deadline Exceeded")
+        if roll < self.model.timeout_rate + self.model.failure_rate:
+            raise FakeGeminiError("503 The model is overloaded")
+
+        query = prompt.rsplit("User Query:", 1)[-1].strip().splitlines()[0] if "User Query:" in prompt else prompt
+        text = f"For '{query[:60]}', a gentle cleanser and a broad-spectrum SPF are a good start."
+        if not stream:
+            time.sleep(latency)
+            return _Response(text)
+        return self._stream(text, latency)
+
+    def _stream(self, text, latency):
+        words = text.split(" ")
+        chunk_count = max(1, len(words) // 4)
+        for i in range(chunk_count):
+            time.sleep(latency / chunk_count)
+            part = words[i * len(words) // chunk_count:(i + 1) * len(words) // chunk_count]
+            yield _Response(" ".join(part) + (" " if i < chunk_count - 1 else ""))
+
+
+class FakeGenerativeModel:
+    """Latency is drawn from a lognormal around latency_ms; failure/timeout rates are per call"""
+
+    def __init__(self, latency_ms=800, jitter=0.35, failure_rate=0.0, timeout_rate=0.0, seed=1234,
+                 model_name="models/fake-gemini"):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def start_chat(self, history=None):
+        return _ChatSession(self, history)
+
+    def _record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def _rng_random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def _draw_latency(self):
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            return self._rng.lognormvariate(0, self.jitter) * self.latency_ms / 1000.0
@@ -0,0 +1,102 @@
+"""Synthetic, replayable chat workloads and data sets for the benchmarks."""
+from datetime import datetime, timedelta
+import json
+import random
+
+PRODUCT_NAMES = [
+    "Hydrating Milky Cleanser", "Hyaluronic Acid Serum", "Ceramide Moisturizer", "Oil-Control Foaming Facewash",
+    "pH-Balanced Gel Cleanser", "Multi-Vitamin Serum", "Lightweight Moisturizer", "Fragrance-Free Cream Cleanser",
+    "Calming Serum", "Barrier Repair Cream",
+]
+SKIN_TYPES = ["dry", "oily", "acne-prone", "combination", "sensitive", "mature", "normal"]
+AI_QUESTIONS = [
+    "is niacinamide ok with retinol", "can i use aha and bha together", "how often should i exfoliate",
+    "what does spf 50 actually mean", "should i moisturize oily skin", "is vitamin c better in the morning",
+    "how long until a serum shows results", "can teenagers use retinol", "what order do i apply skincare in",
+]
+
+# Default branch mix; weights need not sum to 1
+DEFAULT_MIX = {"track": 0.25, "order": 0.1, "catalog": 0.05, "faq_exact": 0.25, "faq_fuzzy": 0.2, "gemini": 0.15}
+
+
+def synthetic_orders(count, seed=7, start_number=10000):
+    """orders.json-shaped dict with `count` orders spread over the last 10 days"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    orders = {}
+    for i in range(count):
+        placed = now - timedelta(seconds=rng.randint(0, 10 * 24 * 3600))
+        orders[f"BEAUTY{start_number + i}"] = {
+            "product": rng.choice(PRODUCT_NAMES),
+            "price": rng.choice([349, 399, 449, 549, 599, 649, 849, 899]),
+            "status": "Confirmed",
+            "delivery_date": (placed + timedelta(days=3)).strftime("%d %b %Y"),
+            "timestamp": placed.isoformat(),
+        }
+    return orders
+
+
+def synthetic_faqs(count, seed=11):
+    """A FAQ table of `count` entries shaped like app.FAQS (question -> answer)"""
+    rng = random.Random(seed)
+    openers = ["what is best for", "recommend product for", "good product for", "routine for", "how to care for"]
+    concerns = SKIN_TYPES + ["dark spots", "large pores", "redness", "dullness", "fine lines", "blackheads",
+                             "uneven tone", "dehydration", "sun damage", "eczema-prone skin"]
+    faqs = {}
+    while len(faqs) < count:
+        question = f"{rng.choice(openers)} {rng.choice(concerns)} {rng.choice(['', 'skin', 'in winter', 'at night'])}"
+        question = " ".join(question.split()) + ("" if rng.random() < 0.8 else f" #{len(faqs)}")
+        faqs[question] = f"Answer {len(faqs)}: " + ", ".join(rng.sample(PRODUCT_NAMES, 3))
+    return faqs
+
+
+def typo(text, rng, edits=2):
+    """Misspell text with a few random deletions, insertions and substitutions"""
+    chars = list(text)
+    for _ in range(edits):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.4:
+            del chars[i]
+        elif op < 0.7:
+            chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        else:
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def conversation_workload(messages, order_ids, faq_keys, mix=None, seed=42, conversations=50):
+    """List of {"conversation", "branch", "message"} dicts; the same seed replays the same workload"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    branches, weights = zip(*mix.items())
+    order_ids = list(order_ids)
+    faq_keys = [k.strip() for k in faq_keys if k.strip()]
+    workload = []
+    for _ in range(messages):
+        branch = rng.choices(branches, weights)[0]
+        if branch == "track":
+            message = f"where is order {rng.choice(order_ids)}?" if order_ids else "track my order"
+        elif branch == "order":
+            message = f"I want to buy {rng.choice(PRODUCT_NAMES).lower()}"
+        elif branch == "catalog":
+            message = rng.choice(["show products", "what do you sell"])
+        elif branch == "faq_exact":
+            message = rng.choice(faq_keys)
+        elif branch == "faq_fuzzy":
+            message = typo(rng.choice(faq_keys).lower(), rng)
+        else:
+            message = f"{rng.choice(AI_QUESTIONS)} {rng.choice(['', 'please', 'for ' + rng.choice(SKIN_TYPES) + ' skin'])}".strip()
+        workload.append({"conversation": rng.randrange(conversations), "branch": branch, "message": message})
+    return workload
+
+
+def save_workload(workload, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for item in workload:
+            f.write(json.dumps(item) + "\n")
+
+
+def load_workload(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import threading
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def _validate(doc):
+    products, answers, faqs = doc.get("products"), doc.get("answers"), doc.get("faqs")
+    if not isinstance(products, dict) or not isinstance(answers, list) or not isinstance(faqs, dict):
+        raise CatalogError("catalog needs 'products' (object), 'answers' (list) and 'faqs' (object)")
+    for key, product in products.items():
+        if not isinstance(product, dict) or not isinstance(product.get("name"), str) \
+                or not isinstance(product.get("price"), (int, float)) or not isinstance(product.get("stock", 0), int):
+            raise CatalogError(f"product {key!r} needs a name, a numeric price and an integer stock")
+    for question, answer_id in faqs.items():
+        if not isinstance(answer_id, int) or not 0 <= answer_id < len(answers):
+            raise CatalogError(f"FAQ {question!r} points at missing answer {answer_id!r}")
+
+
+class CatalogStore:
+    """Products and FAQ answers read from a JSON file, reloaded when the file changes.
+
+    The file keeps each distinct answer once in "answers"; "faqs" maps every
+    question to an answer ID, and the loaded FAQ dict shares one string per
+    answer. Each worker loads the file once and a watcher thread polls its
+    mtime/size; a changed file is parsed off the request path and handed to
+    on_change(products, faqs, products_changed, faqs_changed) so the caller
+    can swap in new objects. A file that fails to parse or validate is logged
+    and the current catalog stays in place. Replace the file atomically
+    (write a temp file, then rename) so readers never see half of it.
+
+    Product dicts are handed out as copies (the app writes live stock into
+    them), and a product's "stock" only seeds the shared stock level.
+    """
+
+    def __init__(self, path="catalog.json"):
+        self.path = path
+        self.products = {}
+        self.faqs = {}
+        self.answers = []
+        self.answer_ids = {}  # question -> index into answers
+        self._file_products = {}  # as parsed, for change detection
+        self._signature = None
+        self._failed_signature = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def load(self):
+        """Read the file now; returns (products, faqs)"""
+        signature = self._stat()
+        with open(self.path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        _validate(doc)
+        answers = doc["answers"]
+        self._file_products = doc["products"]
+        self.products = {key: dict(product) for key, product in doc["products"].items()}
+        self.answers = answers
+        self.answer_ids = doc["faqs"]
+        self.faqs = {question: answers[answer_id] for question, answer_id in self.answer_ids.items()}
+        self._signature = signature
+        logging.info(f"Catalog loaded from {self.path}: {len(self.products)} products, "
+                     f"{len(self.faqs)} FAQ questions, {len(set(self.answer_ids.values()))} distinct answers")
+        return self.products, self.faqs
+
+    def reload_if_changed(self, on_change):
+        """Reload and call on_change if the file changed since the last load; returns whether it did"""
+        signature = None
+        try:
+            signature = self._stat()
+            if signature in (self._signature, self._failed_signature):
+                return False
+            old_products, old_faqs = self._file_products, self.faqs
+            products, faqs = self.load()
+        except (OSError, ValueError) as e:
+            # Keep serving the current catalog until the file changes again
+            self._failed_signature = signature
+            logging.error(f"Catalog reload from {self.path} failed, keeping the current catalog: {e}")
+            return False
+        products_changed, faqs_changed = self._file_products != old_products, faqs != old_faqs
+        if products_changed or faqs_changed:
+            on_change(products, faqs, products_changed, faqs_changed)
+        return True
+
+    def start(self, on_change, interval=5):
+        """Poll the file every interval seconds on a daemon thread"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload_if_changed(on_change)
+                except Exception:
+                    logging.exception("Applying the reloaded catalog failed")
+
+        self._thread = threading.Thread(target=run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
@@ -0,0 +1,62 @@
+def estimate_tokens(text, chars_per_token=4):
+    """Rough token count (about 4 characters per token for English with Gemini's tokenizer)"""
+    return (len(text) + chars_per_token - 1) // chars_per_token
+
+
+class ContextBuilder:
+    """Prompt and chat history for a Gemini fallback call.
+
+    The instructions and catalog preamble are rendered once per catalog
+    fingerprint and reused until PRODUCTS changes. History is taken newest
+    turn first until history_tokens (estimated) would be exceeded, instead of
+    a fixed number of turns.
+    """
+
+    def __init__(self, history_tokens=800, chars_per_token=4):
+        self.history_tokens = history_tokens
+        self.chars_per_token = chars_per_token
+        self._preamble = (None, "")  # (catalog fingerprint, rendered text), replaced as one tuple
+
+    def preamble(self, products, fingerprint):
+        cached_fingerprint, text = self._preamble
+        if cached_fingerprint != fingerprint:
+            text = f"""You are BeautyBot, an e-commerce chatbot for a skincare store.
+    Your goal is to answer questions about skincare, recommend products, and assist with orders.
+    Keep responses concise, helpful, and under 3 sentences.
+    Do not provide information about products not listed in the provided PRODUCTS list.
+    Do not make up order IDs or product names.
+    Current products available: {list(products.keys())}.
+
+"""
+            self._preamble = (fingerprint, text)
+        return text
+
+    def history(self, turns):
+        """Gemini history for the most recent turns (oldest first) that fit the token budget"""
+        budget = self.history_tokens
+        selected = []
+        for turn in reversed(turns):
+            if "user" not in turn or "bot" not in turn:
+                continue
+            cost = estimate_tokens(turn["user"] + turn["bot"], self.chars_per_token)
+            if cost > budget:
+                break
+            budget -= cost
+            selected.append(turn)
+        gemini_history = []
+        for turn in reversed(selected):
+            gemini_history.append({"role": "user", "parts": [turn["user"]]})
+            gemini_history.append({"role": "model", "parts": [turn["bot"]]})
+        return gemini_history
+
+    def build(self, user_input, turns, products, fingerprint, summary=""):
+        """(history, prompt) for ChatSession.send_message()"""
+        prompt = f"{self.preamble(products, fingerprint)}    User Query: {user_input}\n    "
+        if summary:
+            prompt += f"\n    Earlier in this conversation the user asked: {summary}\n"
+        return self.history(turns), prompt
+
+    def tokens(self, gemini_history, prompt):
+        """Estimated tokens sent for one call"""
+        history_text = "".join(part for content in gemini_history for part in content["parts"])
+        return estimate_tokens(prompt + history_text, self.chars_per_token)
@@ -0,0 +1,144 @@
+from collections import OrderedDict, deque
+import json
+import secrets
+import threading
+import time
+
+
+class _Conversation:
+    __slots__ = ("turns", "summary", "size", "last_seen")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.summary = ""
+        self.size = 0
+        self.last_seen = time.monotonic()
+
+
+class ConversationStore:
+    """Server-side chat history keyed by a session ID kept in the cookie.
+
+    Each conversation keeps only its last max_turns turns in a ring buffer.
+    With summary_chars set, the user side of older turns is folded into a
+    short running summary instead of being dropped outright. Conversations
+    idle for idle_ttl seconds are evicted, and the least recently used ones
+    go first once max_conversations or max_bytes is exceeded.
+    """
+
+    def __init__(self, max_turns=10, idle_ttl=1800, max_conversations=10000,
+                 max_bytes=32 * 1024 * 1024, summary_chars=0):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.summary_chars = summary_chars
+        self._conversations = OrderedDict()  # least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id():
+        return secrets.token_urlsafe(16)
+
+    def append(self, sid, user, bot):
+        turn = {"user": user, "bot": bot}
+        turn_size = len(user) + len(bot)
+        with self._lock:
+            self._expire(time.monotonic())
+            conversation = self._touch(sid, create=True)
+            if len(conversation.turns) == self.max_turns:
+                oldest = conversation.turns[0]
+                conversation.size -= len(oldest["user"]) + len(oldest["bot"])
+                self._bytes -= len(oldest["user"]) + len(oldest["bot"])
+                self._fold_into_summary(conversation, oldest)
+            conversation.turns.append(turn)
+            conversation.size += turn_size
+            self._bytes += turn_size
+            while self._conversations and (len(self._conversations) > self.max_conversations
+                                           or self._bytes > self.max_bytes):
+                self._evict(next(iter(self._conversations)))
+
+    def history(self, sid):
+        """Recent turns, oldest first"""
+        with self._lock:
+            conversation = self._touch(sid)
+            return list(conversation.turns) if conversation else []
+
+    def summary(self, sid):
+        with self._lock:
+            conversation = self._touch(sid)
+            return conversation.summary if conversation else ""
+
+    def stats(self):
+        with self._lock:
+            return {"conversations": len(self._conversations), "bytes": self._bytes}
+
+    def _touch(self, sid, create=False):
+        conversation = self._conversations.get(sid)
+        if conversation is None:
+            if not create:
+                return None
+            conversation = self._conversations[sid] = _Conversation(self.max_turns)
+        else:
+            self._conversations.move_to_end(sid)
+        conversation.last_seen = time.monotonic()
+        return conversation
+
+    def _expire(self, now):
+        # LRU order is also last-seen order, so expired conversations are at the front
+        while self._conversations:
+            sid, conversation = next(iter(self._conversations.items()))
+            if now - conversation.last_seen < self.idle_ttl:
+                break
+            self._evict(sid)
+
+    def _evict(self, sid):
+        conversation = self._conversations.pop(sid)
+        self._bytes -= conversation.size
+
+    def _fold_into_summary(self, conversation, turn):
+        if self.summary_chars:
+            conversation.summary = _folded(conversation.summary, turn, self.summary_chars)
+
+
+class SharedConversationStore:
+    """ConversationStore's interface over a SharedState backend (SQLite or Redis).
+
+    With several workers a conversation's requests land on any of them, so
+    the ring buffer and summary live in the backend where every worker sees
+    the same history. Turns are stored as JSON; the backend keeps the last
+    max_turns of them and forgets a conversation idle_ttl seconds after its
+    last turn, which also bounds how much it holds.
+    """
+
+    new_id = staticmethod(ConversationStore.new_id)
+
+    def __init__(self, backend, max_turns=10, idle_ttl=1800, summary_chars=0):
+        self.backend = backend
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.summary_chars = summary_chars
+
+    def append(self, sid, user, bot):
+        turn = json.dumps({"user": user, "bot": bot})
+        dropped = self.backend.push_turn(sid, turn, self.max_turns, self.idle_ttl)
+        if dropped and self.summary_chars:
+            summary = self.backend.get_summary(sid)
+            for oldest in dropped:
+                summary = _folded(summary, json.loads(oldest), self.summary_chars)
+            self.backend.set_summary(sid, summary, self.idle_ttl)
+
+    def history(self, sid):
+        """Recent turns, oldest first"""
+        return [json.loads(turn) for turn in self.backend.get_turns(sid)]
+
+    def summary(self, sid):
+        return self.backend.get_summary(sid)
+
+
+def _folded(summary, turn, summary_chars):
+    """summary with the question of turn appended"""
+    question = " ".join(turn["user"].split())[:80]
+    summary = f"{summary}; {question}" if summary else question
+    # Keep the most recent questions when the summary outgrows its budget
+    return summary[-summary_chars:]
@@ -0,0 +1,116 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from difflib import SequenceMatcher
+import logging
+
+
+class FAQIndex:
+    """Startup-built lookup tables for the FAQ answers.
+
+    Exact lookups are a single dict hit. Fuzzy lookups return the same key
+    difflib.get_close_matches(..., n=1) would, but only run the expensive
+    SequenceMatcher.ratio() on keys that can still beat the best score found.
+
+    ratio() is 2*M/T, where the M matched characters form a common
+    subsequence, so 2*LCS/T bounds it from above. Every key sits in its own
+    byte-aligned field of one big integer with a zero guard bit above it, and
+    a bit-parallel LCS pass (one step per query character) yields the LCS of
+    the query with all keys at once. Keys whose bound is under the cutoff are
+    dropped before any SequenceMatcher work; the rest are scored best bound
+    first.
+    """
+
+    def __init__(self, faqs, cutoff=0.6):
+        self.cutoff = cutoff
+        self.rebuild(faqs)
+
+    def rebuild(self, faqs):
+        """Rebuild every table from the given FAQ dict (call after FAQS changes)"""
+        self.faqs = faqs
+        self.exact = {}
+        for key in faqs:
+            # First key wins, as with the old next(q for q in FAQS ...) lookup
+            self.exact.setdefault(key.lower(), key)
+
+        self.keys = list(self.exact)
+        # Key indexes sorted by length, for the real_quick_ratio() window
+        self.by_length = sorted(range(len(self.keys)), key=lambda i: len(self.keys[i]))
+        self.lengths = [len(self.keys[i]) for i in self.by_length]
+
+        # Field j (in by_length order) starts at byte offsets[j]; len // 8 + 1 bytes leave room for the guard bit
+        self.offsets = []
+        positions = defaultdict(list)
+        size = 0
+        for idx in self.by_length:
+            self.offsets.append(size)
+            for position, char in enumerate(self.keys[idx]):
+                positions[char].append(size * 8 + position)
+            size += len(self.keys[idx]) // 8 + 1
+        self.field_bytes = size
+        self.char_masks = {char: _bits(bits, size) for char, bits in positions.items()}
+        self.key_bits = _bits((self.offsets[j] * 8 + position for j in range(len(self.keys))
+                               for position in range(self.lengths[j])), size)
+        logging.info(f"FAQ index built: {len(self.keys)} keys, {len(self.char_masks)} distinct characters")
+
+    def exact_key(self, text):
+        """Original FAQ key whose lowercase form equals text, or None"""
+        return self.exact.get(text.lower())
+
+    def fuzzy_key(self, text, cutoff=None):
+        """Original FAQ key of the closest match above the cutoff (default: the index's), or None"""
+        word = text.lower()
+        if not word or not self.keys:
+            return None
+        cutoff = self.cutoff if cutoff is None else cutoff
+
+        # ratio() <= 2*min(la, lb) / (la + lb), so only this length window can qualify
+        la = len(word)
+        lo = bisect_left(self.lengths, la * cutoff / (2.0 - cutoff) - 1e-9)
+        hi = bisect_right(self.lengths, la * (2.0 - cutoff) / cutoff + 1e-9)
+        if lo >= hi:
+            return None
+
+        common = self._lcs_fields(word)
+        candidates = []
+        for j in range(lo, hi):
+            start = self.offsets[j]
+            end = self.offsets[j + 1] if j + 1 < len(self.offsets) else self.field_bytes
+            lcs = int.from_bytes(common[start:end], "little")
+            if lcs:
+                bound = 2.0 * bin(lcs).count("1") / (la + self.lengths[j])
+                if bound >= cutoff:
+                    candidates.append((bound, self.by_length[j]))
+        candidates.sort(reverse=True)
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        best_score, best_key = -1.0, None
+        for bound, idx in candidates:
+            if bound < best_score:
+                break  # Sorted by bound, so no later key can win either
+            key = self.keys[idx]
+            matcher.set_seq1(key)
+            score = matcher.ratio()
+            # get_close_matches breaks score ties on the larger string
+            if score >= cutoff and (score, key) > (best_score, best_key or ""):
+                best_score, best_key = score, key
+
+        return self.exact[best_key] if best_key is not None else None
+
+    def _lcs_fields(self, word):
+        """Bytes holding, per key field, one set bit for each character of the key's LCS with word"""
+        # Hyyro's bit-vector LCS; row - matched == row ^ matched (matched is a subset of row), so
+        # only the addition carries, and a carry out of a field stops in its guard bit, masked off here
+        row = self.key_bits
+        for char in word:
+            matched = row & self.char_masks.get(char, 0)
+            row = ((row + matched) | (row ^ matched)) & self.key_bits
+        return (self.key_bits ^ row).to_bytes(self.field_bytes, "little")
+
+
+def _bits(positions, size):
+    """Integer with the given bit positions set, built in a byte buffer of `size` bytes"""
+    buffer = bytearray(size)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
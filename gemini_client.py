@@ -0,0 +1,262 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import threading
+import time
+
+log = logging.getLogger("beautybot.gemini")
+
+
+class GeminiUnavailable(Exception):
+    """Gemini was not called: circuit open, no free slot in time, or no time left before the deadline"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class LazyModel:
+    """Stand-in for genai.GenerativeModel that imports and configures the SDK on first use.
+
+    google.generativeai takes over a second to import and most chats never
+    reach Gemini, so by default that cost moves from startup to the first
+    fallback call, or onto a background thread with warm_up(). A failed
+    initialization is remembered and re-raised rather than retried per call.
+    """
+
+    def __init__(self, api_key, model_name):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        """The real GenerativeModel, initializing it if needed"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None and self._error is None:
+                    self._initialize()
+        if self._model is None:
+            raise RuntimeError(f"Gemini model failed to initialize: {self._error}") from self._error
+        return self._model
+
+    def start_chat(self, history=None):
+        return self.get().start_chat(history=history)
+
+    def warm_up(self):
+        """Initialize on a daemon thread so the first fallback call does not pay for it"""
+        def run():
+            try:
+                self.get()
+            except RuntimeError:
+                pass  # Already logged by _initialize()
+        threading.Thread(target=run, name="gemini-warmup", daemon=True).start()
+
+    def _initialize(self):
+        started = time.perf_counter()
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        except Exception as e:
+            self._error = e
+            log.critical("Failed to configure or initialize Gemini AI model: %s", e, exc_info=True)
+            return
+        log.info("Gemini GenerativeModel '%s' initialized in %.2fs.", self.model_name, time.perf_counter() - started)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and rejects calls for reset_after seconds,
+    then lets a single probe call through (half-open); its outcome closes or reopens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_after=30):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                log.info("Gemini circuit half-open, sending a probe call")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                log.info("Gemini circuit closed")
+            self.state, self.failures = self.CLOSED, 0
+
+    def abandon_probe(self):
+        """The half-open probe never reached Gemini; let the next caller probe instead"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                log.warning("Gemini circuit opened after %d consecutive failures", self.failures)
+                self.state, self._opened_at = self.OPEN, time.monotonic()
+
+
+class GeminiClient:
+    """Shared, bounded access to the Gemini model for all request threads.
+
+    At most max_in_flight calls run at once; callers wait up to queue_timeout
+    (never past their deadline) for a slot. Each call gets the time left until
+    the caller's deadline as its timeout. With hedge_after set, a blocking call
+    still running after that many seconds is raced against a second attempt
+    when a slot is free. Failures feed a CircuitBreaker; while it is open calls
+    raise GeminiUnavailable immediately.
+    """
+
+    def __init__(self, model, max_in_flight=8, queue_timeout=2.0, min_call_timeout=1.0, hedge_after=None,
+                 breaker=None):
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.min_call_timeout = min_call_timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._permits = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix="gemini") if hedge_after else None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.hedges = 0
+        self.rejected = {"circuit_open": 0, "busy": 0, "deadline": 0}
+
+    def generate(self, history, prompt, deadline):
+        """Blocking send_message(); deadline is a time.monotonic() value"""
+        self._acquire(deadline)
+        if self._executor is None:
+            try:
+                response = self._attempt(history, prompt, self._remaining(deadline))
+            finally:
+                self._release()
+            return response
+        return self._hedged(history, prompt, deadline)
+
+    def stream(self, history, prompt, deadline):
+        """Yield streamed chunks; the slot is held until the stream ends or the generator is closed"""
+        self._acquire(deadline)
+        try:
+            chunks = self.model.start_chat(history=history).send_message(
+                prompt, stream=True, request_options={"timeout": self._remaining(deadline)})
+            for chunk in chunks:
+                yield chunk
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Gemini stream passed the request deadline")
+        except GeminiUnavailable:
+            raise
+        except GeneratorExit:
+            self.breaker.record_success()  # the caller stopped reading; chunks were arriving
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "waiting": self.waiting, "max_in_flight": self.max_in_flight,
+                    "circuit": self.breaker.state, "hedges": self.hedges, "rejected": dict(self.rejected)}
+
+    def _attempt(self, history, prompt, timeout):
+        try:
+            response = self.model.start_chat(history=history).send_message(prompt, request_options={"timeout": timeout})
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def _hedged(self, history, prompt, deadline):
+        # Each attempt owns one slot and gives it back when it finishes, even after the caller gave up on it
+        attempts = [self._submit(history, prompt, deadline)]
+        done, _ = wait(attempts, timeout=min(self.hedge_after, max(0.0, deadline - time.monotonic())))
+        if not done and self._try_acquire():
+            with self._lock:
+                self.hedges += 1
+            log.info("Gemini call slower than %.1fs, sending a hedged request", self.hedge_after)
+            attempts.append(self._submit(history, prompt, deadline))
+
+        error = None
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error or TimeoutError("Gemini call passed the request deadline")
+
+    def _submit(self, history, prompt, deadline):
+        try:
+            future = self._executor.submit(self._attempt, history, prompt, self._remaining(deadline))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining < self.min_call_timeout:
+            raise self._reject("deadline")
+        return remaining
+
+    def _acquire(self, deadline):
+        if not self.breaker.allow():
+            raise self._reject("circuit_open")
+        wait_for = min(self.queue_timeout, deadline - time.monotonic() - self.min_call_timeout)
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = wait_for > 0 and self._permits.acquire(timeout=wait_for)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            raise self._reject("busy" if wait_for > 0 else "deadline")
+        with self._lock:
+            self.in_flight += 1
+
+    def _try_acquire(self):
+        if not self.breaker.allow() or not self._permits.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._permits.release()
+
+    def _reject(self, reason):
+        if reason != "circuit_open":
+            self.breaker.abandon_probe()
+        with self._lock:
+            self.rejected[reason] += 1
+        return GeminiUnavailable(reason)
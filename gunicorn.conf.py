@@ -0,0 +1,20 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app` (see Procfile).
+#
+# The default "gthread" worker serves each request on its own thread, so one
+# worker process can hold many slow Gemini calls / /chat/stream responses in
+# flight without blocking tracking, ordering and FAQ traffic.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# More than one worker needs SHARED_STATE_URL set to sqlite:///shared_state.db (one host) or
+# redis://host:6379/0. With the memory:// default, stock and rate limits are per-process and
+# order IDs are only kept apart by per-worker shards (ORDER_ID_SHARDS, defaults to this count).
+# Each worker then logs to its own logs/chatbot.<pid>.log (LOG_PER_PROCESS), since two processes
+# rotating one file lose lines; LOG_ROTATE_WHEN=external leaves rotation to logrotate instead
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("GUNICORN_THREADS", 32))
+# Well above GEMINI_REQUEST_BUDGET (25s by default), which caps a request's Gemini calls,
+# so slow AI answers are not killed mid-stream
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 90))
+keepalive = 5
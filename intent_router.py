@@ -0,0 +1,121 @@
+from collections import deque, namedtuple
+import logging
+
+# What a single routing pass extracts from a message
+Route = namedtuple("Route", ["intent", "text", "order_id", "product_key"])
+
+
+class _Automaton:
+    """Aho-Corasick matcher: reports every pattern occurrence in one pass over the text"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]  # node -> pattern ids ending there (including via fail links)
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.out[node].append(pattern_id)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def matches(self, text):
+        """Yield (end_index, pattern_id) for every occurrence"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern_id in out[node]:
+                yield i, pattern_id
+
+
+class IntentRouter:
+    """Keyword intents, product mentions and order IDs from one automaton pass.
+
+    intents is a list of (name, keywords) in priority order: the first intent
+    with any keyword in the message wins, as the old if/elif cascade did.
+    Messages with no intent keyword get default_intent. A product mention
+    resolves to the first PRODUCTS entry whose name or key appears.
+    """
+
+    def __init__(self, intents, products, default_intent="faq", order_prefix="beauty"):
+        self.intents = list(intents)
+        self.default_intent = default_intent
+        self.order_prefix = order_prefix
+        self.handlers = {}
+        self.rebuild(products)
+
+    def rebuild(self, products):
+        """Recompile the automaton (call after PRODUCTS or the intent list changes)"""
+        patterns = {}  # lowercase pattern -> list of ("intent", rank) / ("product", rank) / ("order_id", 0)
+        for rank, (_, keywords) in enumerate(self.intents):
+            for keyword in keywords:
+                patterns.setdefault(keyword.lower(), []).append(("intent", rank))
+        for rank, (key, product) in enumerate(products.items()):
+            for text in (product["name"].lower(), key.lower()):
+                patterns.setdefault(text, []).append(("product", rank))
+        patterns.setdefault(self.order_prefix, []).append(("order_id", 0))
+
+        pattern_list = list(patterns)
+        automaton = _Automaton(pattern_list)
+        # Published as one tuple so a concurrent route() never mixes old and new tables
+        self._compiled = ([patterns[p] for p in pattern_list], list(products), automaton)
+        self.patterns = pattern_list
+        logging.info(f"Intent router compiled: {len(pattern_list)} patterns, {len(automaton.goto)} states")
+
+    def route(self, text):
+        lowered = text.lower()
+        targets, product_keys, automaton = self._compiled
+        intent_rank = product_rank = None
+        order_id = None
+        for end, pattern_id in automaton.matches(lowered):
+            for kind, rank in targets[pattern_id]:
+                if kind == "intent":
+                    intent_rank = rank if intent_rank is None else min(intent_rank, rank)
+                elif kind == "product":
+                    product_rank = rank if product_rank is None else min(product_rank, rank)
+                elif order_id is None:
+                    order_id = self._order_id_at(lowered, end)
+
+        intent = self.intents[intent_rank][0] if intent_rank is not None else self.default_intent
+        product_key = product_keys[product_rank] if product_rank is not None else None
+        return Route(intent, text, order_id, product_key)
+
+    def _order_id_at(self, lowered, prefix_end):
+        start = prefix_end - len(self.order_prefix) + 1
+        if start > 0 and lowered[start - 1].isalnum():
+            return None
+        end = prefix_end + 1
+        while end < len(lowered) and lowered[end].isdigit():
+            end += 1
+        if end == prefix_end + 1 or (end < len(lowered) and lowered[end].isalnum()):
+            return None
+        return lowered[start:end].upper()
+
+    def handler(self, intent):
+        """Decorator registering the function that answers an intent"""
+        def register(fn):
+            self.handlers[intent] = fn
+            return fn
+        return register
+
+    def dispatch(self, route):
+        handler = self.handlers.get(route.intent)
+        return handler(route) if handler else None
@@ -0,0 +1,196 @@
+from datetime import datetime, timezone
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+
+class _DeferredFlushMixin:
+    """Write records to the file buffer; only flush when the writer thread says so"""
+
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        self.acquire()
+        try:
+            if self.stream and hasattr(self.stream, "flush"):
+                self.stream.flush()
+        finally:
+            self.release()
+
+
+class BatchedRotatingFileHandler(_DeferredFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class BatchedTimedRotatingFileHandler(_DeferredFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class BatchedWatchedFileHandler(_DeferredFlushMixin, logging.handlers.WatchedFileHandler):
+    pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _LogWriter(threading.Thread):
+    """Drains the log queue in batches, then flushes the file once per batch"""
+
+    def __init__(self, log_queue, handler, batch_size, flush_interval):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not (self._stopped.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                try:
+                    self.handler.handle(record)
+                except Exception:
+                    self.handler.handleError(record)
+            self.handler.flush_now()
+
+    def stop(self):
+        self._stopped.set()
+        self.join(timeout=5)
+        self.handler.flush_now()
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers message formatting to the writer thread.
+
+    The stock QueueHandler.prepare() formats every record on the calling
+    thread; here only exception info is rendered eagerly (tracebacks cannot
+    cross threads safely) and args stay unformatted.
+    """
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _parse_pairs(spec):
+    """'gemini=DEBUG,chat=0.1' -> {'gemini': 'DEBUG', 'chat': '0.1'}"""
+    pairs = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            pairs[name.strip()] = value.strip()
+    return pairs
+
+
+def configure_logging(log_dir="logs", level="INFO", json_lines=False, max_bytes=10 * 1024 * 1024,
+                      backup_count=7, rotate_when=None, batch_size=256, flush_interval=1.0,
+                      category_levels=None, sample_rates=None, prefix="beautybot", per_process=False):
+    """Route all logging through a queue to a batched, rotating file writer.
+
+    Request threads only enqueue records (formatting happens on the writer
+    thread). Files rotate by size, or by time when rotate_when is set (e.g.
+    "midnight"); rotate_when="external" leaves rotation to logrotate and
+    reopens the file once it has been moved. category_levels and
+    sample_rates are keyed by category, i.e. the part after "<prefix>." in
+    the logger name.
+
+    Size and time rotation rename the file from inside the process, so two
+    processes must never rotate the same file: with several workers set
+    per_process, which puts the pid in the name (chatbot.<pid>.log).
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    name = f"chatbot.{os.getpid()}" if per_process else "chatbot"
+    path = os.path.join(log_dir, name + (".jsonl" if json_lines else ".log"))
+    if rotate_when == "external":
+        handler = BatchedWatchedFileHandler(path, encoding="utf-8")
+    elif rotate_when:
+        handler = BatchedTimedRotatingFileHandler(path, when=rotate_when, backupCount=backup_count, encoding="utf-8")
+    else:
+        handler = BatchedRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    if json_lines:
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(name)s | %(message)s',
+                                               datefmt='%Y-%m-%d %H:%M:%S'))
+
+    log_queue = queue.SimpleQueue()
+    writer = _LogWriter(log_queue, handler, batch_size, flush_interval)
+    writer.start()
+    atexit.register(writer.stop)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_EnqueueHandler(log_queue))
+    root.setLevel(level)
+
+    for category, category_level in (category_levels or {}).items():
+        logging.getLogger(f"{prefix}.{category}").setLevel(category_level.upper())
+    for category, rate in (sample_rates or {}).items():
+        logging.getLogger(f"{prefix}.{category}").addFilter(SamplingFilter(float(rate)))
+    return writer
+
+
+def configure_logging_from_env(prefix="beautybot"):
+    """configure_logging() driven by LOG_* environment variables
+
+    LOG_PER_PROCESS defaults to on when WEB_CONCURRENCY runs more than one
+    worker, so each worker writes and rotates its own chatbot.<pid>.log.
+    """
+    per_process = os.getenv("LOG_PER_PROCESS", "1" if int(os.getenv("WEB_CONCURRENCY", 1)) > 1 else "0")
+    return configure_logging(
+        log_dir=os.getenv("LOG_DIR", "logs"),
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        json_lines=os.getenv("LOG_FORMAT", "text") == "json",
+        max_bytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        backup_count=int(os.getenv("LOG_BACKUP_COUNT", 7)),
+        rotate_when=os.getenv("LOG_ROTATE_WHEN") or None,
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", 256)),
+        flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", 1.0)),
+        category_levels=_parse_pairs(os.getenv("LOG_LEVELS")),
+        sample_rates=_parse_pairs(os.getenv("LOG_SAMPLING")),
+        prefix=prefix,
+        per_process=per_process != "0",
+    )
@@ -0,0 +1,142 @@
+from bisect import bisect_left
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond FAQ hits up to the per-request Gemini budget
+# (GEMINI_REQUEST_BUDGET, 25s by default); 30 and 60 catch requests that overrun it or a raised budget
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 25, 30, 60)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+TOKEN_BUCKETS = (128, 256, 512, 768, 1024, 1536, 2048, 4096)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, values)} {count}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus two additions under a lock"""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram, self.label_values = histogram, label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class Gauge:
+    """Value read from a callback at scrape time (e.g. cache sizes)"""
+
+    def __init__(self, name, help_text, callback):
+        self.name, self.help, self.callback = name, help_text, callback
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.callback()}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, callback):
+        return self._register(Gauge(name, help_text, callback))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CHAT_LATENCY = registry.histogram(
+    "beautybot_chat_seconds", "Time to answer a chat message, by the branch that answered it", ("branch",))
+GEMINI_LATENCY = registry.histogram(
+    "beautybot_gemini_call_seconds", "Duration of Gemini API calls", ("mode",))
+GEMINI_CALLS = registry.counter(
+    "beautybot_gemini_calls_total",
+    "Gemini API calls by outcome (ok, empty, timeout, error; circuit_open, busy, deadline when not sent)", ("outcome",))
+ORDER_STORE_WRITE = registry.histogram(
+    "beautybot_order_store_write_seconds", "Order store write latency", ("op",))
+SESSION_COOKIE_BYTES = registry.histogram(
+    "beautybot_session_cookie_bytes", "Size of the session cookie sent with chat requests", buckets=SIZE_BUCKETS)
+GEMINI_PROMPT_TOKENS = registry.histogram(
+    "beautybot_gemini_prompt_tokens", "Estimated tokens (prompt + history) sent per Gemini call", buckets=TOKEN_BUCKETS)
+
+
+def is_timeout(exc):
+    """Gemini surfaces deadlines as DeadlineExceeded/TimeoutError depending on transport"""
+    return isinstance(exc, TimeoutError) or "Deadline" in type(exc).__name__ or "Timeout" in type(exc).__name__
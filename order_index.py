@@ -0,0 +1,78 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+import threading
+
+
+def range_bound(value, end=False):
+    """ISO date/datetime string -> comparable timestamp string; a bare end date covers that whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
+
+
+class OrderIndex:
+    """Order IDs sorted by placement time, for date-range queries and cursor pagination.
+
+    Orders store their timestamp as datetime.isoformat(), which sorts
+    chronologically as a string, so the index is a sorted list of
+    (timestamp, order_id) pairs searched with bisect. The list is sorted on
+    the first query rather than at startup; until then add() is a no-op,
+    since the build reads the live orders dict.
+    """
+
+    def __init__(self, orders):
+        self._lock = threading.Lock()
+        self._orders = orders
+        self._placed, self._entries = None, None
+
+    def rebuild(self, orders):
+        with self._lock:
+            self._orders = orders
+            self._placed, self._entries = None, None
+            self._ensure_built()
+
+    def add(self, order_id, order):
+        with self._lock:
+            if self._entries is None or order_id in self._placed:
+                return
+            self._placed[order_id] = order.get("timestamp", "")
+            insort(self._entries, (self._placed[order_id], order_id))
+
+    def _ensure_built(self):
+        # Called with the lock held, so an add() racing the first build waits and is not lost
+        if self._entries is None:
+            self._placed = {order_id: order.get("timestamp", "") for order_id, order in list(self._orders.items())}
+            self._entries = sorted((timestamp, order_id) for order_id, timestamp in self._placed.items())
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_built()
+            return len(self._entries)
+
+    def __contains__(self, order_id):
+        with self._lock:
+            self._ensure_built()
+            return order_id in self._placed
+
+    def between(self, start=None, end=None, after=None, limit=None):
+        """Order IDs placed in [start, end), oldest first, resuming after the order ID `after`.
+
+        Raises KeyError for an `after` that is not in the index, rather than starting over.
+        """
+        with self._lock:
+            self._ensure_built()
+            if after is not None:
+                if after not in self._placed:
+                    raise KeyError(after)
+                lo = bisect_left(self._entries, (self._placed[after], after)) + 1
+            else:
+                lo = 0
+            if start is not None:
+                lo = max(lo, bisect_left(self._entries, (start, "")))
+            hi = bisect_left(self._entries, (end, "")) if end is not None else len(self._entries)
+            if limit is not None:
+                hi = min(hi, lo + limit)
+            return [order_id for _, order_id in self._entries[lo:hi]]
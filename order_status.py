@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+import heapq
+import logging
+import threading
+import time
+
+STATUS_FLOW = ["Confirmed", "Shipped", "Delivered"]
+
+
+class OrderStatusScheduler:
+    """Deterministic order status progression, applied lazily.
+
+    An order placed at `timestamp` is Shipped once ship_after has passed and
+    Delivered once deliver_after has passed. Tracking calls refresh() for the
+    one order asked about; a background thread pops due transitions off a
+    time-ordered heap and applies them in batches. The heap of existing
+    orders is built on that thread rather than in __init__, so a large order
+    book does not slow down startup.
+
+    on_change(changes) gets a list of (order_id, old_status, new_status),
+    once per refresh() or run_due() batch and without the lock held. Since
+    every worker derives the same statuses from the same timestamps, the
+    transitions need no persisting; the callback is for logging. Transitions
+    that fell due before `started` are history: load_due() applies them
+    quietly and only queues the ones still ahead, so a restart neither
+    replays nor re-logs the order book. The lock must be re-entrant, since
+    callers may already hold it.
+    """
+
+    def __init__(self, orders, lock, on_change, ship_after=timedelta(days=1), deliver_after=timedelta(days=3),
+                 started=None):
+        self.orders = orders
+        self.lock = lock
+        self.on_change = on_change
+        self.offsets = {"Shipped": ship_after, "Delivered": deliver_after}
+        self.started = started or datetime.now()
+        self._due = []  # (due_epoch, order_id)
+        self._stop = threading.Event()
+        self._thread = None
+        self._loaded = False
+
+    def load_due(self):
+        """Catch every existing order up to `started` and queue its next transition (once)"""
+        with self.lock:
+            if self._loaded:
+                return
+            snapshot = list(self.orders.items())
+        # Parse timestamps without the lock; a stale entry only costs an extra refresh()
+        caught_up, entries = [], []
+        for order_id, order in snapshot:
+            status, due = self._plan(order, self.started)
+            if status != order.get("status"):
+                caught_up.append((order_id, status))
+            if due is not None:
+                entries.append((due, order_id))
+        with self.lock:
+            if self._loaded:
+                return
+            for order_id, status in caught_up:
+                order = self.orders.get(order_id)
+                # Statuses only move forward; a refresh() in the meantime may already be further along
+                if order is not None and STATUS_FLOW.index(order["status"]) < STATUS_FLOW.index(status):
+                    order["status"] = status
+            self._due.extend(entries)
+            heapq.heapify(self._due)
+            self._loaded = True
+
+    def schedule(self, order_id):
+        """Queue the next transition of a newly placed order"""
+        with self.lock:
+            self._push_next(order_id, self.orders[order_id], datetime.now())
+
+    def status_at(self, order, now):
+        return self._plan(order, now)[0]
+
+    def refresh(self, order_id, now=None):
+        """Bring one order's status up to date and return the order"""
+        changes = []
+        with self.lock:
+            order = self._advance(order_id, now or datetime.now(), changes)
+        if changes:
+            self.on_change(changes)
+        return order
+
+    def run_due(self, now=None, batch_size=500):
+        """Apply up to batch_size due transitions; returns how many orders were refreshed"""
+        self.load_due()
+        now = now or datetime.now()
+        now_epoch = now.timestamp()
+        done = 0
+        changes = []
+        with self.lock:
+            while self._due and self._due[0][0] <= now_epoch and done < batch_size:
+                _, order_id = heapq.heappop(self._due)
+                order = self._advance(order_id, now, changes)
+                if order is not None:
+                    self._push_next(order_id, order, now)
+                done += 1
+        if changes:
+            self.on_change(changes)
+        return done
+
+    def start(self, interval=60, batch_size=500):
+        """Advance due orders on a daemon thread every `interval` seconds"""
+        def loop():
+            try:
+                self.load_due()
+            except Exception:
+                logging.exception("Loading due order status transitions failed")
+            while not self._stop.wait(interval):
+                try:
+                    while self.run_due(batch_size=batch_size) == batch_size:
+                        time.sleep(0)  # Let request threads take the lock between batches
+                except Exception:
+                    logging.exception("Order status scheduler failed")
+
+        self._thread = threading.Thread(target=loop, name="order-status-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _advance(self, order_id, now, changes):
+        # Caller holds the lock; the transition is reported once it is released
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        new_status = self.status_at(order, now)
+        if new_status != order["status"]:
+            if _placed_at(order) + self.offsets[new_status] >= self.started:
+                changes.append((order_id, order["status"], new_status))
+            order["status"] = new_status
+        return order
+
+    def _plan(self, order, now):
+        """(status at now, epoch of the transition after that or None), parsing the timestamp once"""
+        current = order.get("status")
+        if current not in STATUS_FLOW or current == STATUS_FLOW[-1]:
+            return current, None
+        placed = _placed_at(order)
+        if placed is None:
+            return current, None
+        status = current
+        for next_status in STATUS_FLOW[STATUS_FLOW.index(current) + 1:]:
+            due = placed + self.offsets[next_status]
+            if now < due:
+                return status, due.timestamp()
+            status = next_status
+        return status, None
+
+    def _push_next(self, order_id, order, now):
+        due = self._plan(order, now)[1]
+        if due is not None:
+            heapq.heappush(self._due, (due, order_id))
+
+
+def _placed_at(order):
+    try:
+        return datetime.fromisoformat(order["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None
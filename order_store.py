@@ -0,0 +1,333 @@
+import json
+import logging
+import marshal
+import os
+import sqlite3
+import sys
+import threading
+import traceback
+
+try:
+    import fcntl  # POSIX only; without it the journal is safe for a single process
+except ImportError:
+    fcntl = None
+
+
+class _FileLock:
+    """Exclusive inter-process lock on a sidecar file (no-op where fcntl is missing)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class OrderStore:
+    """Persistence interface for the orders dict.
+
+    load() returns {order_id: order}; put() records a whole order and
+    update() merges changed fields into an existing one.
+    """
+
+    def load(self):
+        raise NotImplementedError
+
+    def put(self, order_id, order):
+        raise NotImplementedError
+
+    def update(self, order_id, fields):
+        raise NotImplementedError
+
+    def refresh(self, orders):
+        """Merge in changes other workers wrote since load(); returns newly seen order IDs"""
+        return []
+
+    def close(self):
+        pass
+
+
+class JournalOrderStore(OrderStore):
+    """orders.json snapshot plus an append-only JSONL journal of changes.
+
+    Each write appends one line, so cost does not grow with order history.
+    Every compact_every appends the journal is folded into a new snapshot
+    (written to a temp file, fsynced and renamed over the old one) and
+    truncated. Replaying is idempotent, so a crash between the rename and
+    the truncate loses nothing. Records this worker had not replayed yet when
+    it compacted are kept aside and applied by its next refresh().
+
+    With snapshot_cache, a marshal copy of the parsed snapshot is kept next
+    to it (orders.json.cache) and used instead of parsing the JSON whenever
+    the snapshot file is unchanged since the copy was written. orders.json
+    stays the source of truth; the cache is rewritten whenever it is stale.
+    """
+
+    def __init__(self, snapshot_path="orders.json", journal_path="orders.journal.jsonl",
+                 compact_every=1000, fsync=True, snapshot_cache=True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.snapshot_cache = snapshot_cache
+        self.cache_path = f"{snapshot_path}.cache"
+        self._lock = threading.Lock()
+        self._file_lock = _FileLock(journal_path + ".lock")
+        self._appends = 0
+        self._offset = 0  # Journal bytes already applied to the in-memory orders
+        self._unapplied = []  # Records folded into the snapshot by our compaction but not yet replayed
+        self._snapshot_stamp = None
+
+    def load(self):
+        with self._lock, self._file_lock:
+            orders = self._read_snapshot()
+            replayed, self._offset = self._replay(orders)
+            self._unapplied = []
+            self._snapshot_stamp = self._stamp()
+        logging.info(f"Loaded {len(orders)} orders from {self.snapshot_path} "
+                     f"(+{replayed} journal entries from {self.journal_path})")
+        return orders
+
+    def put(self, order_id, order):
+        self._append({"op": "put", "id": order_id, "order": order})
+
+    def update(self, order_id, fields):
+        self._append({"op": "update", "id": order_id, "fields": fields})
+
+    def refresh(self, orders):
+        with self._lock, self._file_lock:
+            journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+            if self._stamp() != self._snapshot_stamp or journal_size < self._offset:
+                # Another worker compacted: start again from the new snapshot
+                fresh = self._read_snapshot()
+                _, self._offset = self._replay(fresh)
+                self._unapplied = []
+                self._snapshot_stamp = self._stamp()
+                new_ids = [order_id for order_id in fresh if order_id not in orders]
+                # Orders are never removed, and one placed here but not yet written must survive
+                orders.update(fresh)
+                return new_ids
+            new_ids = []
+            unapplied, self._unapplied = self._unapplied, []
+            for record in unapplied:
+                self._apply(orders, record, new_ids)
+            _, self._offset = self._replay(orders, self._offset, new_ids)
+            return new_ids
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and truncate it"""
+        with self._lock, self._file_lock:
+            self._compact_locked()
+
+    def _append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock, self._file_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._appends += 1
+            if self.compact_every and self._appends >= self.compact_every:
+                self._compact_locked()
+
+    def _compact_locked(self):
+        # Rebuilt from disk rather than memory so other workers' appends are kept
+        orders = self._read_snapshot()
+        self._replay(orders)
+        unapplied, _ = self._read_records(self._offset)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(orders, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._write_cache(orders, self._stamp())
+            with open(self.journal_path, "w", encoding="utf-8") as f:
+                f.flush()
+                os.fsync(f.fileno())
+            self._appends = 0
+            self._offset = 0
+            self._unapplied.extend(unapplied)
+            self._snapshot_stamp = self._stamp()
+            logging.info(f"Compacted {len(orders)} orders into {self.snapshot_path}")
+        except Exception as e:
+            logging.error(f"Error compacting order journal {self.journal_path}: {e}")
+            logging.error(traceback.format_exc())
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            logging.info(f"Orders file {self.snapshot_path} not found. Starting with empty orders.")
+            return {}
+        stamp = self._stamp()
+        cached = self._read_cache(stamp)
+        if cached is not None:
+            return cached
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                orders = json.load(f)
+        except json.JSONDecodeError as e:
+            logging.error(f"Error decoding {self.snapshot_path}: {e}")
+            logging.error(traceback.format_exc())
+            return {}
+        self._write_cache(orders, stamp)
+        return orders
+
+    def _read_cache(self, stamp):
+        """Orders from the marshal cache if it was written for this exact snapshot, else None"""
+        if not self.snapshot_cache or stamp is None:
+            return None
+        try:
+            with open(self.cache_path, "rb") as f:
+                python, cache_stamp, orders = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        # marshal's format is only stable within one Python version
+        if python != list(sys.version_info[:2]) or cache_stamp != list(stamp):
+            return None
+        return orders
+
+    def _write_cache(self, orders, stamp):
+        if not self.snapshot_cache or stamp is None:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(marshal.dumps((list(sys.version_info[:2]), list(stamp), orders)))
+            os.replace(tmp_path, self.cache_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not write order snapshot cache {self.cache_path}: {e}")
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.snapshot_path)
+            return st.st_ino, st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _replay(self, orders, offset=0, new_ids=None):
+        """Apply journal records from byte offset on; returns (records applied, end offset)"""
+        records, offset = self._read_records(offset)
+        for record in records:
+            self._apply(orders, record, new_ids)
+        return len(records), offset
+
+    def _read_records(self, offset=0):
+        """Complete journal records from byte offset on; returns (records, end offset)"""
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records, 0
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being appended; picked up by the next refresh
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn line from a crash mid-append; everything around it is intact
+                    logging.warning(f"Skipping unreadable journal line in {self.journal_path}")
+        return records, offset
+
+    @staticmethod
+    def _apply(orders, record, new_ids=None):
+        if record["op"] == "put":
+            if new_ids is not None and record["id"] not in orders:
+                new_ids.append(record["id"])
+            orders[record["id"]] = record["order"]
+        elif record["id"] in orders:
+            orders[record["id"]].update(record["fields"])
+
+
+class SQLiteOrderStore(OrderStore):
+    """Orders as JSON rows in a WAL-mode SQLite table (one row write per change)"""
+
+    def __init__(self, path="orders.db", import_from="orders.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_rowid = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS orders (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        if import_from:
+            self._import_snapshot(import_from)
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT rowid, id, data FROM orders").fetchall()
+        self._last_rowid = max((row[0] for row in rows), default=0)
+        logging.info(f"Loaded {len(rows)} orders from {self.path}")
+        return {order_id: json.loads(data) for _, order_id, data in rows}
+
+    def refresh(self, orders):
+        # Status changes are derived per worker, so only rows added since the last look matter
+        with self._lock:
+            rows = self._conn.execute("SELECT rowid, id, data FROM orders WHERE rowid > ?",
+                                      (self._last_rowid,)).fetchall()
+        new_ids = []
+        for rowid, order_id, data in rows:
+            self._last_rowid = max(self._last_rowid, rowid)
+            if order_id not in orders:
+                new_ids.append(order_id)
+            orders[order_id] = json.loads(data)
+        return new_ids
+
+    def put(self, order_id, order):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO orders (id, data) VALUES (?, ?)",
+                               (order_id, json.dumps(order)))
+
+    def update(self, order_id, fields):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM orders WHERE id = ?", (order_id,)).fetchone()
+                if row:
+                    order = json.loads(row[0])
+                    order.update(fields)
+                    self._conn.execute("UPDATE orders SET data = ? WHERE id = ?", (json.dumps(order), order_id))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _import_snapshot(self, snapshot_path):
+        """One-time migration of an existing orders.json into an empty table"""
+        if not os.path.exists(snapshot_path):
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone():
+                return
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("INSERT OR IGNORE INTO orders (id, data) VALUES (?, ?)",
+                                   ((order_id, json.dumps(order)) for order_id, order in snapshot.items()))
+            self._conn.execute("COMMIT")
+        logging.info(f"Imported {len(snapshot)} orders from {snapshot_path} into {self.path}")
+
+
+def open_order_store(kind="journal", **kwargs):
+    """Build the order store named by kind ("journal" or "sqlite")"""
+    if kind == "journal":
+        return JournalOrderStore(**kwargs)
+    if kind == "sqlite":
+        return SQLiteOrderStore(**kwargs)
+    raise ValueError(f"Unknown order store '{kind}' (expected 'journal' or 'sqlite')")
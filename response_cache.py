@@ -0,0 +1,144 @@
+from collections import Counter, OrderedDict, defaultdict
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_query(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def catalog_fingerprint(products):
+    """Short hash of the product keys embedded in the Gemini prompt"""
+    return hashlib.sha1(json.dumps(list(products.keys())).encode("utf-8")).hexdigest()[:16]
+
+
+def _vector(normalized):
+    counts = Counter(normalized.split())
+    norm = math.sqrt(sum(n * n for n in counts.values()))
+    return counts, norm
+
+
+def _cosine(a, b):
+    counts_a, norm_a = a
+    counts_b, norm_b = b
+    if not norm_a or not norm_b:
+        return 0.0
+    if len(counts_a) > len(counts_b):
+        counts_a, counts_b = counts_b, counts_a
+    return sum(n * counts_b.get(tok, 0) for tok, n in counts_a.items()) / (norm_a * norm_b)
+
+
+class ResponseCache:
+    """TTL + LRU cache for Gemini fallback answers.
+
+    Entries are keyed by (catalog fingerprint, normalized query). With a
+    similarity threshold set, an exact miss falls back to the most similar
+    cached query (bag-of-words cosine) for the same catalog. Queries sharing
+    no word have a cosine of 0, so an inverted index from (fingerprint,
+    word) to keys limits scoring to entries sharing at least one word.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, max_bytes=2 * 1024 * 1024, similarity=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self._entries = OrderedDict()  # key -> (expires_at, response, vector)
+        self._by_token = defaultdict(set)  # (fingerprint, word) -> keys of entries containing it
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text, fingerprint):
+        normalized = normalize_query(text)
+        key = (fingerprint, normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                self._remove(key)
+
+            if self.similarity:
+                match = self._most_similar(fingerprint, _vector(normalized), now)
+                if match:
+                    self._entries.move_to_end(match)
+                    self.similar_hits += 1
+                    return self._entries[match][1]
+
+            self.misses += 1
+            return None
+
+    def put(self, text, fingerprint, response):
+        normalized = normalize_query(text)
+        key = (fingerprint, normalized)
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            vector = _vector(normalized)
+            self._entries[key] = (time.monotonic() + self.ttl, response, vector)
+            self._bytes += size
+            for token in vector[0]:
+                self._by_token[(fingerprint, token)].add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_token.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry[1].encode("utf-8"))
+        for token in entry[2][0]:
+            keys = self._by_token[(key[0], token)]
+            keys.discard(key)
+            if not keys:
+                del self._by_token[(key[0], token)]
+
+    def _most_similar(self, fingerprint, vector, now):
+        candidates = set()
+        for token in vector[0]:
+            candidates.update(self._by_token.get((fingerprint, token), ()))
+        best_key, best_score = None, self.similarity
+        for key in candidates:
+            expires_at, _, cached_vector = self._entries[key]
+            if expires_at <= now:
+                continue
+            score = _cosine(vector, cached_vector)
+            # Equal scores go to the larger query so the answer does not depend on set order
+            if score > best_score or (score == best_score and (best_key is None or key > best_key)):
+                best_key, best_score = key, score
+        return best_key
@@ -0,0 +1,78 @@
+from collections import namedtuple
+from hashlib import sha1
+
+# One static answer, ready to send from /chat (json_body) or /chat/stream (sse_body)
+Rendered = namedtuple("Rendered", ["text", "json_body", "sse_body", "etag"])
+
+
+def _etag(body):
+    return sha1(body).hexdigest()[:20]
+
+
+class ResponseRenderer:
+    """Pre-encoded response bodies for answers that only change with the catalog or FAQ table.
+
+    The catalog replies, every FAQ answer and the /api/catalog and /api/faqs
+    documents are formatted and encoded once, then looked up by answer text.
+    refresh() re-renders only when a product's name, price or in-stock flag
+    changed. encode_json and encode_sse come from the app so the bytes are
+    exactly what jsonify() and sse_event() would have produced. get_stocks
+    maps product keys to quantities (the shared stock, so every worker
+    reports the same availability); by default the products' own "stock".
+    """
+
+    def __init__(self, products, faqs, encode_json, encode_sse, get_stocks=None):
+        self.products = products
+        self.get_stocks = get_stocks or (lambda keys: {key: self.products[key].get("stock", 0) for key in keys})
+        self.encode_json = encode_json
+        self.encode_sse = encode_sse
+        self._signature = None
+        self.rebuild_faqs(faqs)
+
+    def rebuild_faqs(self, faqs):
+        """Re-encode everything after the FAQ table was replaced"""
+        self.faqs = faqs
+        self.faqs_body = self.encode_json({"faqs": faqs})
+        self.faqs_etag = _etag(self.faqs_body)
+        self._signature = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-render the catalog if a name, price or availability changed; returns whether it did"""
+        products = self.products
+        stock = self.get_stocks(products)
+        signature = tuple((key, p["name"], p["price"], stock.get(key, 0) > 0) for key, p in products.items())
+        if signature == self._signature:
+            return False
+
+        listing = "\n".join(f"- {p['name']} (₹{p['price']})" for p in products.values())
+        catalog_reply = f"Available products:\n{listing}"
+        unknown_product_reply = (
+            f"Sorry, I couldn't find the product in your request.\n"
+            f"Available products:\n{listing}\n"
+            f"Say 'order [product name]' to place an order."
+        )
+        catalog_body = self.encode_json({"products": [
+            {"key": key, "name": p["name"], "price": p["price"], "in_stock": stock.get(key, 0) > 0}
+            for key, p in products.items()
+        ]})
+
+        rendered = {}
+        for text in list(self.faqs.values()) + [catalog_reply, unknown_product_reply]:
+            if text not in rendered:
+                json_body = self.encode_json({"response": text})
+                sse_body = self.encode_sse({"delta": text}) + self.encode_sse({"done": True, "response": text})
+                rendered[text] = Rendered(text, json_body, sse_body, _etag(json_body))
+
+        # Readers see either the old or the new set; each name is rebound to a finished object
+        self.catalog_listing = listing
+        self.catalog_reply = catalog_reply
+        self.unknown_product_reply = unknown_product_reply
+        self.catalog_body, self.catalog_etag = catalog_body, _etag(catalog_body)
+        self._rendered = rendered
+        self._signature = signature
+        return True
+
+    def rendered(self, text):
+        """Rendered answer for text if it is one of the static answers, else None"""
+        return self._rendered.get(text)
@@ -0,0 +1,540 @@
+import select
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+
+
+class SharedState:
+    """State that has to agree across gunicorn workers (and hosts).
+
+    init_stock() seeds stock levels without overwriting ones already set by
+    another worker; reserve_stock() atomically takes units and returns the
+    remaining stock, or None when there is not enough; next_block() hands out
+    disjoint blocks of a named integer sequence; incr()/get()/get_expiry()/
+    clear() back the rate limiter's fixed-window counters. The backends
+    shared between workers also keep chat history for SharedConversationStore
+    (push_turn()/get_turns()/get_summary()/set_summary()); with memory://
+    ConversationStore keeps it in the process instead.
+    """
+
+    def init_stock(self, stock):
+        raise NotImplementedError
+
+    def get_stock(self, product_key):
+        raise NotImplementedError
+
+    def get_stocks(self, product_keys):
+        """{product_key: qty} for several products in one round trip where the backend allows it"""
+        return {product_key: self.get_stock(product_key) for product_key in product_keys}
+
+    def reserve_stock(self, product_key, qty=1):
+        raise NotImplementedError
+
+    def release_stock(self, product_key, qty=1):
+        raise NotImplementedError
+
+    def next_block(self, name, size=1):
+        """Reserve `size` consecutive values of sequence `name`; returns the first"""
+        raise NotImplementedError
+
+    def advance_sequence(self, name, minimum):
+        """Make sure the next value handed out by sequence `name` is above `minimum`"""
+        raise NotImplementedError
+
+    def incr(self, key, expiry, amount=1):
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def get_expiry(self, key):
+        raise NotImplementedError
+
+    def clear(self, key):
+        raise NotImplementedError
+
+    def reset(self):
+        """Drop all rate limit counters; returns how many were removed"""
+        raise NotImplementedError
+
+    def push_turn(self, sid, turn, max_turns, ttl):
+        """Append turn (a string) to conversation sid, keeping its last max_turns; returns the turns pushed out.
+
+        The conversation is forgotten ttl seconds after its last push.
+        """
+        raise NotImplementedError
+
+    def get_turns(self, sid):
+        """Turns of conversation sid, oldest first"""
+        raise NotImplementedError
+
+    def get_summary(self, sid):
+        raise NotImplementedError
+
+    def set_summary(self, sid, summary, ttl):
+        raise NotImplementedError
+
+    def check(self):
+        return True
+
+
+class MemorySharedState(SharedState):
+    """Single-process implementation (the behaviour before shared state existed)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stock = {}
+        self._sequences = {}
+        self._counters = {}  # key -> [value, expires_at]
+
+    def init_stock(self, stock):
+        with self._lock:
+            for product_key, qty in stock.items():
+                self._stock.setdefault(product_key, qty)
+
+    def get_stock(self, product_key):
+        with self._lock:
+            return self._stock.get(product_key, 0)
+
+    def reserve_stock(self, product_key, qty=1):
+        with self._lock:
+            available = self._stock.get(product_key, 0)
+            if available < qty:
+                return None
+            self._stock[product_key] = available - qty
+            return available - qty
+
+    def release_stock(self, product_key, qty=1):
+        with self._lock:
+            self._stock[product_key] = self._stock.get(product_key, 0) + qty
+
+    def next_block(self, name, size=1):
+        with self._lock:
+            start = self._sequences.get(name, 0) + 1
+            self._sequences[name] = start + size - 1
+            return start
+
+    def advance_sequence(self, name, minimum):
+        with self._lock:
+            self._sequences[name] = max(self._sequences.get(name, 0), minimum)
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[1] <= now:
+                counter = self._counters[key] = [0, now + expiry]
+            counter[0] += amount
+            return counter[0]
+
+    def get(self, key):
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter[0] if counter and counter[1] > time.time() else 0
+
+    def get_expiry(self, key):
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter[1] if counter else time.time()
+
+    def clear(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            count = len(self._counters)
+            self._counters.clear()
+            return count
+
+
+class SQLiteSharedState(SharedState):
+    """Shared state for all workers on one host, in a WAL-mode SQLite file"""
+
+    def __init__(self, path="shared_state.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS stock (key TEXT PRIMARY KEY, qty INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters "
+                           "(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS conversations "
+                           "(sid TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS turns "
+                           "(seq INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, turn TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_by_sid ON turns (sid, seq)")
+        self._writes = 0
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def init_stock(self, stock):
+        self._transaction(lambda c: c.executemany(
+            "INSERT OR IGNORE INTO stock (key, qty) VALUES (?, ?)", stock.items()))
+
+    def get_stock(self, product_key):
+        with self._lock:
+            row = self._conn.execute("SELECT qty FROM stock WHERE key = ?", (product_key,)).fetchone()
+        return row[0] if row else 0
+
+    def get_stocks(self, product_keys):
+        product_keys = list(product_keys)
+        with self._lock:
+            rows = dict(self._conn.execute(
+                f"SELECT key, qty FROM stock WHERE key IN ({', '.join('?' * len(product_keys))})",
+                product_keys).fetchall())
+        return {product_key: rows.get(product_key, 0) for product_key in product_keys}
+
+    def reserve_stock(self, product_key, qty=1):
+        def reserve(c):
+            updated = c.execute("UPDATE stock SET qty = qty - ? WHERE key = ? AND qty >= ?",
+                                (qty, product_key, qty)).rowcount
+            if not updated:
+                return None
+            return c.execute("SELECT qty FROM stock WHERE key = ?", (product_key,)).fetchone()[0]
+        return self._transaction(reserve)
+
+    def release_stock(self, product_key, qty=1):
+        self._transaction(lambda c: c.execute(
+            "INSERT INTO stock (key, qty) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET qty = qty + excluded.qty",
+            (product_key, qty)))
+
+    def next_block(self, name, size=1):
+        def allocate(c):
+            c.execute("INSERT INTO sequences (name, value) VALUES (?, ?) "
+                      "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, size))
+            return c.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()[0] - size + 1
+        return self._transaction(allocate)
+
+    def advance_sequence(self, name, minimum):
+        self._transaction(lambda c: c.execute(
+            "INSERT INTO sequences (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)", (name, minimum)))
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+
+        def increment(c):
+            c.execute("DELETE FROM counters WHERE key = ? AND expires_at <= ?", (key, now))
+            c.execute("INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                      "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", (key, amount, now + expiry))
+            return c.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+        value = self._transaction(increment)
+        self._count_write(now)
+        return value
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM counters WHERE key = ? AND expires_at > ?",
+                                     (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def clear(self, key):
+        self._transaction(lambda c: c.execute("DELETE FROM counters WHERE key = ?", (key,)))
+
+    def reset(self):
+        return self._transaction(lambda c: c.execute("DELETE FROM counters").rowcount)
+
+    def push_turn(self, sid, turn, max_turns, ttl):
+        now = time.time()
+
+        def push(c):
+            row = c.execute("SELECT expires_at FROM conversations WHERE sid = ?", (sid,)).fetchone()
+            if row and row[0] <= now:
+                self._drop_conversations(c, "sid = ?", (sid,))
+            c.execute("INSERT INTO conversations (sid, expires_at) VALUES (?, ?) "
+                      "ON CONFLICT(sid) DO UPDATE SET expires_at = excluded.expires_at", (sid, now + ttl))
+            c.execute("INSERT INTO turns (sid, turn) VALUES (?, ?)", (sid, turn))
+            dropped = c.execute("SELECT seq, turn FROM turns WHERE sid = ? ORDER BY seq DESC LIMIT -1 OFFSET ?",
+                                (sid, max_turns)).fetchall()
+            c.executemany("DELETE FROM turns WHERE seq = ?", ((seq,) for seq, _ in dropped))
+            return [turn for _, turn in reversed(dropped)]
+        dropped = self._transaction(push)
+        self._count_write(now)
+        return dropped
+
+    def _count_write(self, now):
+        # Counters of clients that went quiet and idle conversations are never touched again,
+        # so every 100th write sweeps out everything that has expired
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._transaction(lambda c: (c.execute("DELETE FROM counters WHERE expires_at <= ?", (now,)),
+                                         self._drop_conversations(c, "expires_at <= ?", (now,))))
+
+    def get_turns(self, sid):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT turn FROM turns WHERE sid = ? AND EXISTS "
+                "(SELECT 1 FROM conversations WHERE sid = ? AND expires_at > ?) ORDER BY seq",
+                (sid, sid, time.time())).fetchall()
+        return [row[0] for row in rows]
+
+    def get_summary(self, sid):
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM conversations WHERE sid = ? AND expires_at > ?",
+                                     (sid, time.time())).fetchone()
+        return row[0] if row else ""
+
+    def set_summary(self, sid, summary, ttl):
+        self._transaction(lambda c: c.execute(
+            "UPDATE conversations SET summary = ?, expires_at = ? WHERE sid = ?", (summary, time.time() + ttl, sid)))
+
+    @staticmethod
+    def _drop_conversations(c, where, params):
+        c.execute(f"DELETE FROM turns WHERE sid IN (SELECT sid FROM conversations WHERE {where})", params)
+        c.execute(f"DELETE FROM conversations WHERE {where}", params)
+
+    def check(self):
+        with self._lock:
+            self._conn.execute("SELECT 1").fetchone()
+        return True
+
+
+class RedisError(Exception):
+    pass
+
+
+# Commands that leave the same state when run twice, so one whose reply was lost can be sent again
+_IDEMPOTENT = {"GET", "MGET", "PING", "KEYS", "PTTL", "LRANGE", "SET", "DEL", "EXPIRE", "LTRIM"}
+
+
+class _RespConnection:
+    """Minimal RESP2 client: enough commands for RedisSharedState, no extra dependency"""
+
+    def __init__(self, host, port, db=0, password=None, timeout=5):
+        self.host, self.port, self.db, self.password, self.timeout = host, port, db, password, timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        if self.password:
+            self._roundtrip(("AUTH", self.password))
+        if self.db:
+            self._roundtrip(("SELECT", self.db))
+
+    def _close(self):
+        if self._sock:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+    def execute(self, *args):
+        with self._lock:
+            for attempt in (1, 2):
+                sent = False
+                try:
+                    if self._sock is not None and self._closed_by_server():
+                        self._close()
+                    if self._sock is None:
+                        self._connect()
+                    self._send(args)
+                    sent = True
+                    return self._read_reply()
+                except (OSError, EOFError):
+                    self._close()
+                    # A command that went out may have run (DECRBY, INCRBY, RPUSH); only resend harmless ones
+                    if attempt == 2 or (sent and str(args[0]).upper() not in _IDEMPOTENT):
+                        raise
+
+    def _closed_by_server(self):
+        # Between commands nothing should be readable: data here is the EOF of a dropped idle connection
+        readable, _, _ = select.select([self._sock], [], [], 0)
+        return bool(readable)
+
+    def _roundtrip(self, args):
+        self._send(args)
+        return self._read_reply()
+
+    def _send(self, args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise EOFError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._file.read(length + 2)[:-2]
+            return data.decode("utf-8")
+        if kind == b"*":
+            count = int(payload)
+            return None if count == -1 else [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply from Redis: {line!r}")
+
+
+class RedisSharedState(SharedState):
+    """Shared state in any Redis-protocol server, for workers spread over several hosts"""
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="beautybot:"):
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self._conn = _RespConnection(parsed.hostname or "localhost", parsed.port or 6379, db, parsed.password)
+
+    def _key(self, kind, name):
+        return f"{self.prefix}{kind}:{name}"
+
+    def init_stock(self, stock):
+        for product_key, qty in stock.items():
+            self._conn.execute("SET", self._key("stock", product_key), qty, "NX")
+
+    def get_stock(self, product_key):
+        return int(self._conn.execute("GET", self._key("stock", product_key)) or 0)
+
+    def get_stocks(self, product_keys):
+        product_keys = list(product_keys)
+        if not product_keys:
+            return {}
+        values = self._conn.execute("MGET", *(self._key("stock", product_key) for product_key in product_keys))
+        return {product_key: int(value or 0) for product_key, value in zip(product_keys, values)}
+
+    def reserve_stock(self, product_key, qty=1):
+        # DECRBY is atomic; an overdraw is handed straight back, so stock is never oversold
+        remaining = self._conn.execute("DECRBY", self._key("stock", product_key), qty)
+        if remaining < 0:
+            self._conn.execute("INCRBY", self._key("stock", product_key), qty)
+            return None
+        return remaining
+
+    def release_stock(self, product_key, qty=1):
+        self._conn.execute("INCRBY", self._key("stock", product_key), qty)
+
+    def next_block(self, name, size=1):
+        return self._conn.execute("INCRBY", self._key("seq", name), size) - size + 1
+
+    def advance_sequence(self, name, minimum):
+        # Racing workers may both add the gap; that only skips values, never repeats them
+        current = int(self._conn.execute("GET", self._key("seq", name)) or 0)
+        if current < minimum:
+            self._conn.execute("INCRBY", self._key("seq", name), minimum - current)
+
+    def incr(self, key, expiry, amount=1):
+        # SET NX EX starts the window with its expiry; INCRBY keeps the TTL
+        self._conn.execute("SET", self._key("rl", key), 0, "EX", max(int(expiry), 1), "NX")
+        return self._conn.execute("INCRBY", self._key("rl", key), amount)
+
+    def get(self, key):
+        return int(self._conn.execute("GET", self._key("rl", key)) or 0)
+
+    def get_expiry(self, key):
+        ttl_ms = self._conn.execute("PTTL", self._key("rl", key))
+        return time.time() + max(ttl_ms, 0) / 1000.0
+
+    def clear(self, key):
+        self._conn.execute("DEL", self._key("rl", key))
+
+    def reset(self):
+        keys = self._conn.execute("KEYS", self._key("rl", "*"))
+        return self._conn.execute("DEL", *keys) if keys else 0
+
+    def push_turn(self, sid, turn, max_turns, ttl):
+        key = self._key("turns", sid)
+        length = self._conn.execute("RPUSH", key, turn)
+        dropped = []
+        if length > max_turns:
+            dropped = self._conn.execute("LRANGE", key, 0, length - max_turns - 1)
+            self._conn.execute("LTRIM", key, -max_turns, -1)
+        self._conn.execute("EXPIRE", key, max(int(ttl), 1))
+        return dropped
+
+    def get_turns(self, sid):
+        return self._conn.execute("LRANGE", self._key("turns", sid), 0, -1)
+
+    def get_summary(self, sid):
+        return self._conn.execute("GET", self._key("summary", sid)) or ""
+
+    def set_summary(self, sid, summary, ttl):
+        self._conn.execute("SET", self._key("summary", sid), summary, "EX", max(int(ttl), 1))
+
+    def check(self):
+        return self._conn.execute("PING") == "PONG"
+
+
+class SharedStateLimiterStorage(Storage):
+    """Flask-Limiter storage that keeps its counters in a SharedState backend.
+
+    Use with storage_uri="sharedstate://" and storage_options={"backend": shared_state}.
+    Only the default fixed-window strategy is supported.
+    """
+
+    STORAGE_SCHEME = ["sharedstate"]
+
+    def __init__(self, uri=None, backend=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.backend = backend or MemorySharedState()
+
+    @property
+    def base_exceptions(self):
+        return (OSError, EOFError, RedisError, sqlite3.Error)
+
+    def incr(self, key, expiry, amount=1):
+        return self.backend.incr(key, expiry, amount)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def get_expiry(self, key):
+        return self.backend.get_expiry(key)
+
+    def check(self):
+        try:
+            return self.backend.check()
+        except Exception:
+            return False
+
+    def reset(self):
+        return self.backend.reset()
+
+    def clear(self, key):
+        self.backend.clear(key)
+
+
+def open_shared_state(url="memory://"):
+    """Build a backend from memory://, sqlite:///path/to/file.db or redis://host:port/db"""
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemorySharedState()
+    if scheme == "sqlite":
+        return SQLiteSharedState(url[len("sqlite:///"):] or "shared_state.db")
+    if scheme == "redis":
+        return RedisSharedState(url)
+    raise ValueError(f"Unknown shared state backend '{url}'")
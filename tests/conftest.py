@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app's modules live at the repo root; benchmarks/ has the synthetic workloads and the fake Gemini model
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
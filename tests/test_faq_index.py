@@ -0,0 +1,59 @@
+from difflib import get_close_matches
+import json
+import os
+import random
+
+import pytest
+
+import workload
+from faq_index import FAQIndex
+
+CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catalog.json")
+
+
+def catalog_faqs():
+    with open(CATALOG, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    return {question: doc["answers"][answer_id] for question, answer_id in doc["faqs"].items()}
+
+
+def close_match(word, faqs, cutoff):
+    """What the app used to do: difflib over the lowercased keys, mapped back to the original key"""
+    lowered = {}
+    for key in faqs:
+        lowered.setdefault(key.lower(), key)
+    match = get_close_matches(word.lower(), list(lowered), n=1, cutoff=cutoff)
+    return lowered[match[0]] if match else None
+
+
+def queries(faqs, rng, count):
+    keys = [key.lower() for key in faqs]
+    words = [workload.typo(rng.choice(keys), rng, edits=rng.randrange(1, 8)) for _ in range(count)]
+    words += ["".join(rng.choice("abcdefghij prst") for _ in range(rng.randrange(1, 40))) for _ in range(count)]
+    return words + [question for question in workload.AI_QUESTIONS] + ["hi", "a", "skincare"]
+
+
+@pytest.mark.parametrize("cutoff", [0.6, 0.4, 0.8])
+def test_fuzzy_key_matches_get_close_matches_on_the_catalog(cutoff):
+    faqs = catalog_faqs()
+    index = FAQIndex(faqs)
+    for word in queries(faqs, random.Random(1), 120):
+        assert index.fuzzy_key(word, cutoff) == close_match(word, faqs, cutoff), word
+
+
+def test_fuzzy_key_matches_get_close_matches_on_a_large_table():
+    faqs = workload.synthetic_faqs(200, seed=5)
+    index = FAQIndex(faqs, cutoff=0.6)
+    for word in queries(faqs, random.Random(2), 30):
+        assert index.fuzzy_key(word) == close_match(word, faqs, 0.6), word
+
+
+def test_score_ties_go_to_the_larger_key_like_difflib():
+    faqs = {"abcx": "1", "abcy": "2", "ABCZ": "3"}
+    assert FAQIndex(faqs).fuzzy_key("abc") == close_match("abc", faqs, 0.6) == "ABCZ"
+
+
+def test_exact_key_keeps_the_first_of_case_variants():
+    index = FAQIndex({"Hi": "1", "hi": "2"})
+    assert index.exact_key("HI") == "Hi"
+    assert index.fuzzy_key("") is None and FAQIndex({}).fuzzy_key("hi") is None
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from fake_gemini import FakeGeminiError, FakeGenerativeModel
+from gemini_client import CircuitBreaker, GeminiClient, GeminiUnavailable
+
+
+class ScriptedLatencyModel(FakeGenerativeModel):
+    """Fake model whose calls take the given latencies (seconds) in order"""
+
+    def __init__(self, *latencies, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = list(latencies)
+
+    def _draw_latency(self):
+        with self._lock:
+            return self.latencies.pop(0)
+
+
+def open_breaker(reset_after=0):
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=reset_after)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def wait_until(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_breaker_lets_a_single_probe_through_once_reset_after_has_passed():
+    assert not open_breaker(reset_after=60).allow()
+
+    breaker = open_breaker()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Only one probe at a time
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_probe_rejected_before_the_call_is_handed_to_the_next_caller():
+    model = FakeGenerativeModel(latency_ms=0)
+    client = GeminiClient(model, breaker=open_breaker(), min_call_timeout=1.0)
+
+    with pytest.raises(GeminiUnavailable) as rejected:
+        client.generate([], "hello", deadline=time.monotonic() + 0.5)
+    assert rejected.value.reason == "deadline"
+    assert client.breaker.state == CircuitBreaker.OPEN and model.calls == 0
+
+    assert client.generate([], "hello", deadline=time.monotonic() + 5).text
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.stats()["in_flight"] == 0 and client.stats()["rejected"]["deadline"] == 1
+
+
+def test_open_circuit_rejects_without_calling_the_model():
+    model = FakeGenerativeModel(latency_ms=0)
+    client = GeminiClient(model, breaker=open_breaker(reset_after=60))
+
+    with pytest.raises(GeminiUnavailable, match="circuit_open"):
+        client.generate([], "hello", deadline=time.monotonic() + 5)
+    assert model.calls == 0
+
+
+def test_closed_stream_gives_its_slot_back():
+    client = GeminiClient(FakeGenerativeModel(latency_ms=40, jitter=0), max_in_flight=1, queue_timeout=0.05)
+    chunks = client.stream([], "hello", deadline=time.monotonic() + 5)
+    next(chunks)
+
+    with pytest.raises(GeminiUnavailable, match="busy"):
+        client.generate([], "hello", deadline=time.monotonic() + 5)
+    chunks.close()
+
+    assert client.stats()["in_flight"] == 0
+    assert "".join(chunk.text for chunk in client.stream([], "hello", deadline=time.monotonic() + 5))
+    assert client.breaker.failures == 0
+
+
+def test_stream_past_the_deadline_fails_and_releases_its_slot():
+    client = GeminiClient(FakeGenerativeModel(latency_ms=400, jitter=0), min_call_timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        list(client.stream([], "hello", deadline=time.monotonic() + 0.15))
+    assert client.breaker.failures == 1
+    assert client.stats()["in_flight"] == 0
+
+
+def test_hedged_call_returns_the_faster_attempt_and_releases_both_slots():
+    model = ScriptedLatencyModel(0.3, 0.0)
+    client = GeminiClient(model, max_in_flight=2, hedge_after=0.05)
+
+    started = time.monotonic()
+    assert client.generate([], "hello", deadline=started + 5).text
+    assert time.monotonic() - started < 0.25
+    assert client.hedges == 1 and model.calls == 2
+
+    # The slow attempt still holds its slot until it finishes
+    assert wait_until(lambda: client.stats()["in_flight"] == 0)
+
+
+def test_hedged_call_raises_when_every_attempt_fails():
+    client = GeminiClient(FakeGenerativeModel(latency_ms=0, failure_rate=1.0), hedge_after=0.05)
+
+    with pytest.raises(FakeGeminiError):
+        client.generate([], "hello", deadline=time.monotonic() + 5)
+    assert wait_until(lambda: client.stats()["in_flight"] == 0)
+    assert client.breaker.failures == 1
@@ -0,0 +1,39 @@
+import pytest
+
+from order_ids import OrderIdAllocator, ShardLease
+from shared_state import MemorySharedState
+
+
+def test_ids_count_up_from_the_offset():
+    allocator = OrderIdAllocator(MemorySharedState(), block_size=2)
+
+    assert [allocator.allocate() for _ in range(3)] == ["BEAUTY10000", "BEAUTY10001", "BEAUTY10002"]
+
+
+def test_seed_skips_past_existing_ids():
+    allocator = OrderIdAllocator(MemorySharedState())
+    allocator.seed(["BEAUTY1234", "BEAUTY10041", "BEAUTY10007", "OTHER99999"])
+
+    assert allocator.allocate() == "BEAUTY10042"
+
+
+def test_per_process_sequences_do_not_collide_with_shards(tmp_path):
+    lock_prefix = str(tmp_path / "order_ids.shard")
+    workers = [OrderIdAllocator(MemorySharedState(), block_size=10, shards=ShardLease(2, lock_prefix))
+               for _ in range(2)]
+    for allocator in workers:
+        allocator.seed(["BEAUTY10005"])
+
+    ids = [allocator.allocate() for _ in range(25) for allocator in workers]
+
+    assert len(set(ids)) == len(ids)
+    assert ids[:4] == ["BEAUTY10006", "BEAUTY10007", "BEAUTY10008", "BEAUTY10009"]
+    with pytest.raises(RuntimeError, match="ORDER_ID_SHARDS"):
+        OrderIdAllocator(MemorySharedState(), shards=ShardLease(2, lock_prefix)).allocate()
+
+
+def test_seed_with_shards_stays_above_every_existing_id(tmp_path):
+    allocator = OrderIdAllocator(MemorySharedState(), shards=ShardLease(4, str(tmp_path / "shard")))
+    allocator.seed(["BEAUTY10003", "BEAUTY10010"])
+
+    assert int(allocator.allocate()[len("BEAUTY"):]) > 10010
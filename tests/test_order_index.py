@@ -0,0 +1,44 @@
+import pytest
+
+from order_index import OrderIndex, range_bound
+
+
+def orders_on(*days):
+    return {f"BEAUTY{10000 + n}": {"timestamp": f"2026-03-{day:02d}T12:00:00"} for n, day in enumerate(days)}
+
+
+def test_range_bound_makes_a_bare_end_date_inclusive():
+    assert range_bound("2026-03-05") == "2026-03-05T00:00:00"
+    assert range_bound("2026-03-05", end=True) == "2026-03-06T00:00:00"
+    assert range_bound(None) is None
+
+
+def test_between_pages_through_a_date_range():
+    index = OrderIndex(orders_on(9, 1, 5, 5, 7))
+    start, end = range_bound("2026-03-05"), range_bound("2026-03-07", end=True)
+
+    assert index.between(start, end) == ["BEAUTY10002", "BEAUTY10003", "BEAUTY10004"]
+    assert index.between(start, end, limit=2) == ["BEAUTY10002", "BEAUTY10003"]
+    assert index.between(start, end, after="BEAUTY10003") == ["BEAUTY10004"]
+    assert index.between(after="BEAUTY10000") == []
+
+
+def test_orders_added_before_and_after_the_first_query_are_indexed():
+    orders = orders_on(5)
+    index = OrderIndex(orders)
+    orders.update(orders_on(5, 1))
+    index.add("BEAUTY10001", orders["BEAUTY10001"])
+    assert len(index) == 2
+
+    orders["BEAUTY20000"] = {"timestamp": "2026-03-03T00:00:00"}
+    index.add("BEAUTY20000", orders["BEAUTY20000"])
+    assert index.between() == ["BEAUTY10001", "BEAUTY20000", "BEAUTY10000"]
+    assert "BEAUTY20000" in index
+
+
+def test_unknown_cursor_is_an_error_not_page_one():
+    index = OrderIndex(orders_on(1, 2))
+
+    assert "BEAUTY99999" not in index
+    with pytest.raises(KeyError):
+        index.between(after="BEAUTY99999")
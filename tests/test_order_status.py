@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+import threading
+
+from order_status import OrderStatusScheduler
+
+NOW = datetime(2026, 3, 10, 12, 0)
+
+
+def placed(days_ago, status="Confirmed"):
+    return {"status": status, "timestamp": (NOW - timedelta(days=days_ago)).isoformat()}
+
+
+def scheduler(orders, batches, started=NOW - timedelta(days=30)):
+    lock = threading.RLock()
+
+    def on_change(changes):
+        assert not lock._is_owned()  # Reported only after the lock is released
+        batches.append(changes)
+
+    return OrderStatusScheduler(orders, lock, on_change, started=started)
+
+
+def test_status_follows_the_schedule():
+    orders = {"BEAUTY10000": placed(0.5), "BEAUTY10001": placed(2), "BEAUTY10002": placed(4), "BEAUTY3202": {}}
+    status = scheduler(orders, []).status_at
+
+    assert [status(order, NOW) for order in orders.values()] == ["Confirmed", "Shipped", "Delivered", None]
+
+
+def test_refresh_touches_only_the_order_asked_about():
+    orders = {"BEAUTY10000": placed(2), "BEAUTY10001": placed(4)}
+    batches = []
+
+    assert scheduler(orders, batches).refresh("BEAUTY10000", NOW)["status"] == "Shipped"
+    assert batches == [[("BEAUTY10000", "Confirmed", "Shipped")]]
+    assert orders["BEAUTY10001"]["status"] == "Confirmed"
+
+
+def test_run_due_reports_each_batch_once():
+    orders = {f"BEAUTY{10000 + n}": placed(4) for n in range(8)}
+    orders["BEAUTY20000"] = placed(0.5)
+    orders["BEAUTY20001"] = placed(5, status="Delivered")
+    batches = []
+    status_scheduler = scheduler(orders, batches)
+
+    assert status_scheduler.run_due(NOW, batch_size=3) == 3
+    assert status_scheduler.run_due(NOW, batch_size=3) == 3
+    assert status_scheduler.run_due(NOW, batch_size=3) == 2
+    assert status_scheduler.run_due(NOW, batch_size=3) == 0
+    assert [len(batch) for batch in batches] == [3, 3, 2]
+    assert {order["status"] for order_id, order in orders.items() if order_id < "BEAUTY2"} == {"Delivered"}
+    assert orders["BEAUTY20000"]["status"] == "Confirmed"
+
+    status_scheduler.run_due(NOW + timedelta(days=1))
+    assert orders["BEAUTY20000"]["status"] == "Shipped"
+
+
+def test_history_before_startup_is_applied_quietly():
+    orders = {"BEAUTY10000": placed(400), "BEAUTY10001": placed(2), "BEAUTY10002": placed(0.5)}
+    batches = []
+    status_scheduler = scheduler(orders, batches, started=NOW)
+
+    status_scheduler.load_due()
+    assert [order["status"] for order in orders.values()] == ["Delivered", "Shipped", "Confirmed"]
+    assert sorted(order_id for _, order_id in status_scheduler._due) == ["BEAUTY10001", "BEAUTY10002"]
+    assert status_scheduler.run_due(NOW) == 0
+    assert batches == []
+
+    # Only transitions that fall due while the process runs are reported
+    status_scheduler.run_due(NOW + timedelta(days=1))
+    assert batches == [[("BEAUTY10002", "Confirmed", "Shipped"), ("BEAUTY10001", "Shipped", "Delivered")]]
+
+
+def test_refresh_before_the_heap_is_loaded_does_not_report_history():
+    orders = {"BEAUTY10000": placed(400)}
+    batches = []
+
+    assert scheduler(orders, batches, started=NOW).refresh("BEAUTY10000", NOW)["status"] == "Delivered"
+    assert batches == []
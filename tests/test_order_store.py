@@ -0,0 +1,122 @@
+from order_store import JournalOrderStore, SQLiteOrderStore
+
+
+def order(product="hydrating_serum", status="Confirmed"):
+    return {"product": product, "status": status, "timestamp": "2026-01-01T10:00:00"}
+
+
+def journal_store(tmp_path, **kwargs):
+    kwargs.setdefault("fsync", False)
+    return JournalOrderStore(str(tmp_path / "orders.json"), str(tmp_path / "orders.journal.jsonl"), **kwargs)
+
+
+def test_journal_survives_reopen(tmp_path):
+    store = journal_store(tmp_path)
+    store.load()
+    store.put("BEAUTY10000", order())
+    store.update("BEAUTY10000", {"status": "Shipped"})
+
+    assert journal_store(tmp_path).load() == {"BEAUTY10000": order(status="Shipped")}
+
+
+def test_compaction_keeps_journal_and_cache_consistent(tmp_path):
+    store = journal_store(tmp_path, compact_every=3)
+    store.load()
+    for number in range(10000, 10007):
+        store.put(f"BEAUTY{number}", order())
+
+    assert (tmp_path / "orders.json.cache").exists()
+    assert len(journal_store(tmp_path).load()) == 7
+    assert len(journal_store(tmp_path, snapshot_cache=False).load()) == 7
+
+
+def test_refresh_picks_up_other_workers_orders(tmp_path):
+    a, b = journal_store(tmp_path), journal_store(tmp_path)
+    orders_a, orders_b = a.load(), b.load()
+    b.put("BEAUTY10000", order())
+    orders_b["BEAUTY10000"] = order()
+
+    assert a.refresh(orders_a) == ["BEAUTY10000"]
+    assert a.refresh(orders_a) == []
+    assert orders_a == orders_b
+
+
+def test_compaction_does_not_hide_unreplayed_records_from_the_compacting_worker(tmp_path):
+    a, b = journal_store(tmp_path, compact_every=5), journal_store(tmp_path, compact_every=0)
+    orders_a, orders_b = a.load(), b.load()
+    a.put("BEAUTY10000", order())
+    orders_a["BEAUTY10000"] = order()
+    assert b.refresh(orders_b) == ["BEAUTY10000"]
+    b.put("BEAUTY10001", order("vitamin_c"))
+    orders_b["BEAUTY10001"] = order("vitamin_c")
+    b.update("BEAUTY10000", {"status": "Shipped"})
+    orders_b["BEAUTY10000"]["status"] = "Shipped"
+
+    # A compacts without having replayed B's records first
+    for number in range(10002, 10006):
+        a.put(f"BEAUTY{number}", order())
+        orders_a[f"BEAUTY{number}"] = order()
+    assert not (tmp_path / "orders.journal.jsonl").read_text()
+
+    assert a.refresh(orders_a) == ["BEAUTY10001"]
+    assert orders_a["BEAUTY10001"] == order("vitamin_c")
+    assert orders_a["BEAUTY10000"]["status"] == "Shipped"
+    assert a.refresh(orders_a) == []
+    # B sees the new snapshot and reloads from it
+    assert sorted(b.refresh(orders_b)) == [f"BEAUTY{number}" for number in range(10002, 10006)]
+    assert orders_a == orders_b
+
+
+def test_reload_after_compaction_keeps_an_order_not_yet_written(tmp_path):
+    a, b = journal_store(tmp_path, compact_every=1), journal_store(tmp_path)
+    orders_a, orders_b = a.load(), b.load()
+    a.put("BEAUTY10000", order())
+    orders_a["BEAUTY10000"] = order()
+
+    # B has inserted BEAUTY10001 but not written it yet (the app writes after releasing orders_lock)
+    orders_b["BEAUTY10001"] = order("vitamin_c")
+    assert b.refresh(orders_b) == ["BEAUTY10000"]
+    assert "BEAUTY10001" in orders_b
+    b.put("BEAUTY10001", order("vitamin_c"))
+    assert b.refresh(orders_b) == []
+
+    assert a.refresh(orders_a) == ["BEAUTY10001"]
+    assert orders_a == orders_b
+
+
+def test_torn_journal_line_is_skipped(tmp_path):
+    store = journal_store(tmp_path)
+    store.load()
+    store.put("BEAUTY10000", order())
+    with open(tmp_path / "orders.journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op":"put","id":"BEAUTY1\n')
+    store.put("BEAUTY10001", order())
+
+    assert sorted(journal_store(tmp_path).load()) == ["BEAUTY10000", "BEAUTY10001"]
+
+
+def test_sqlite_store_shares_orders_between_connections(tmp_path):
+    path = str(tmp_path / "orders.db")
+    a = SQLiteOrderStore(path, import_from=None)
+    b = SQLiteOrderStore(path, import_from=None)
+    orders_a, orders_b = a.load(), b.load()
+    a.put("BEAUTY10000", order())
+    a.update("BEAUTY10000", {"status": "Shipped"})
+
+    assert b.refresh(orders_b) == ["BEAUTY10000"]
+    assert orders_b["BEAUTY10000"]["status"] == "Shipped"
+    assert b.refresh(orders_b) == []
+    assert a.refresh(orders_a) == ["BEAUTY10000"]
+    a.close()
+    b.close()
+
+
+def test_sqlite_store_imports_existing_snapshot_once(tmp_path):
+    (tmp_path / "orders.json").write_text('{"BEAUTY1234": {"product": "vitamin_c", "status": "Delivered"}}')
+    path = str(tmp_path / "orders.db")
+    SQLiteOrderStore(path, import_from=str(tmp_path / "orders.json")).close()
+    (tmp_path / "orders.json").write_text('{"BEAUTY9999": {}}')
+    store = SQLiteOrderStore(path, import_from=str(tmp_path / "orders.json"))
+
+    assert list(store.load()) == ["BEAUTY1234"]
+    store.close()
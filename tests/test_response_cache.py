@@ -0,0 +1,23 @@
+from response_cache import ResponseCache
+
+
+def test_similar_query_is_served_from_an_entry_sharing_words():
+    cache = ResponseCache(similarity=0.7)
+    cache.put("Is vitamin C serum good for dull skin?", "fp", "vitamin answer")
+    cache.put("How do I layer sunscreen over moisturizer?", "fp", "sunscreen answer")
+
+    assert cache.get("is vitamin c serum good for dull skin today", "fp") == "vitamin answer"
+    assert cache.get("is vitamin c serum good for dull skin today", "other catalog") is None
+    assert cache.get("what about retinol", "fp") is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_evicted_entries_leave_the_word_index():
+    cache = ResponseCache(max_entries=1, similarity=0.5)
+    cache.put("vitamin c serum for dull skin", "fp", "vitamin answer")
+    cache.put("sunscreen for oily skin", "fp", "sunscreen answer")
+
+    assert cache.get("vitamin c serum for dull skin please", "fp") is None
+    assert set(cache._by_token) == {("fp", word) for word in ("sunscreen", "for", "oily", "skin")}
+    cache.clear()
+    assert not cache._by_token
@@ -0,0 +1,284 @@
+from fnmatch import fnmatchcase
+import socketserver
+import threading
+import time
+
+import pytest
+
+from conversation_store import SharedConversationStore
+from shared_state import RedisError, SQLiteSharedState, RedisSharedState, _RespConnection, open_shared_state
+
+
+class StandInRedis(socketserver.ThreadingTCPServer):
+    """Just enough of a Redis server (RESP2, one shared keyspace) for RedisSharedState"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.password = password
+        self.data = {}  # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+        self.commands = []
+        self.drop_after = set()  # Commands that run, then lose their reply with the connection
+
+    @property
+    def url(self):
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}127.0.0.1:{self.server_address[1]}/0"
+
+    def value(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def run(self, args):
+        command, args = args[0].upper(), args[1:]
+        self.commands.append(command)
+        if self.password and command != "AUTH" and not getattr(threading.current_thread(), "authed", False):
+            raise RedisError("NOAUTH Authentication required.")
+        with self.lock:
+            if command == "PING":
+                return "+PONG"
+            if command == "AUTH":
+                if args[0] != self.password:
+                    raise RedisError("WRONGPASS invalid password")
+                threading.current_thread().authed = True
+                return "+OK"
+            if command == "SELECT":
+                return "+OK"
+            if command == "GET":
+                return self.value(args[0])
+            if command == "MGET":
+                return [self.value(key) for key in args]
+            if command == "SET":
+                key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+                if "NX" in options and self.value(key) is not None:
+                    return None
+                expires_at = time.time() + int(args[2 + options.index("EX") + 1]) if "EX" in options else None
+                self.data[key] = (value, expires_at)
+                return "+OK"
+            if command in ("INCRBY", "DECRBY"):
+                key, amount = args[0], int(args[1]) * (1 if command == "INCRBY" else -1)
+                _, expires_at = self.data.get(key, (None, None))
+                value = int(self.value(key) or 0) + amount
+                self.data[key] = (str(value), expires_at)
+                return value
+            if command == "DEL":
+                return sum(self.data.pop(key, None) is not None for key in args)
+            if command == "KEYS":
+                return [key for key in list(self.data) if fnmatchcase(key, args[0]) and self.value(key) is not None]
+            if command == "RPUSH":
+                items = self.value(args[0]) or []
+                items.extend(args[1:])
+                self.data[args[0]] = (items, self.data.get(args[0], (None, None))[1])
+                return len(items)
+            if command in ("LRANGE", "LTRIM"):
+                items = self.value(args[0]) or []
+                start, stop = (int(n) + len(items) if int(n) < 0 else int(n) for n in args[1:3])
+                if command == "LRANGE":
+                    return items[start:stop + 1]
+                items[:] = items[start:stop + 1]
+                return "+OK"
+            if command == "EXPIRE":
+                if self.value(args[0]) is None:
+                    return 0
+                self.data[args[0]] = (self.data[args[0]][0], time.time() + int(args[1]))
+                return 1
+            if command == "PTTL":
+                if self.value(args[0]) is None:
+                    return -2
+                expires_at = self.data[args[0]][1]
+                return -1 if expires_at is None else int((expires_at - time.time()) * 1000)
+        raise RedisError(f"ERR unknown command '{command}'")
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+            try:
+                reply = self.server.run(args)
+            except RedisError as e:
+                self.wfile.write(f"-{e}\r\n".encode())
+                continue
+            if args[0].upper() in self.server.drop_after:
+                return
+            self.wfile.write(_encode(reply))
+
+    def finish(self):
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+
+def _encode(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode(item) for item in reply)
+    if reply.startswith("+"):
+        return reply.encode() + b"\r\n"
+    data = reply.encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+@pytest.fixture
+def redis_server():
+    server = StandInRedis()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSharedState(str(tmp_path / "shared_state.db"))
+    return RedisSharedState(request.getfixturevalue("redis_server").url)
+
+
+@pytest.fixture
+def second_backend(backend, tmp_path):
+    """Another worker's connection to the same state"""
+    if isinstance(backend, SQLiteSharedState):
+        return SQLiteSharedState(backend.path)
+    return RedisSharedState(f"redis://127.0.0.1:{backend._conn.port}/0")
+
+
+def test_init_stock_keeps_levels_set_by_another_worker(backend, second_backend):
+    backend.init_stock({"vitamin_c": 3})
+    backend.reserve_stock("vitamin_c")
+    second_backend.init_stock({"vitamin_c": 3, "sunscreen": 2})
+
+    assert second_backend.get_stock("vitamin_c") == 2
+    assert backend.get_stock("sunscreen") == 2
+    assert backend.get_stocks(["sunscreen", "retinol", "vitamin_c"]) == {"sunscreen": 2, "retinol": 0, "vitamin_c": 2}
+
+
+def test_reserve_stock_never_oversells(backend, second_backend):
+    backend.init_stock({"vitamin_c": 10})
+    reserved = []
+
+    def buy(state):
+        for _ in range(10):
+            if state.reserve_stock("vitamin_c") is not None:
+                reserved.append(1)
+
+    threads = [threading.Thread(target=buy, args=(state,)) for state in (backend, second_backend) * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(reserved) == 10
+    assert backend.get_stock("vitamin_c") == 0
+    assert backend.reserve_stock("vitamin_c") is None
+    backend.release_stock("vitamin_c", 2)
+    assert second_backend.reserve_stock("vitamin_c", 2) == 0
+
+
+def test_sequence_blocks_are_disjoint(backend, second_backend):
+    backend.advance_sequence("order_id", 41)
+    second_backend.advance_sequence("order_id", 7)
+    blocks = [backend.next_block("order_id", 100), second_backend.next_block("order_id", 100),
+              backend.next_block("order_id", 100)]
+
+    assert blocks == [42, 142, 242]
+
+
+def test_rate_limit_counters_are_shared(backend, second_backend):
+    assert backend.incr("chat/1.2.3.4", 60) == 1
+    assert second_backend.incr("chat/1.2.3.4", 60) == 2
+    assert backend.get("chat/1.2.3.4") == 2
+    assert time.time() < backend.get_expiry("chat/1.2.3.4") <= time.time() + 60
+
+    second_backend.clear("chat/1.2.3.4")
+    assert backend.get("chat/1.2.3.4") == 0
+    backend.incr("a", 60)
+    backend.incr("b", 60)
+    assert second_backend.reset() == 2
+    assert backend.check()
+
+
+def test_open_shared_state_picks_backend_from_url(tmp_path, redis_server):
+    assert isinstance(open_shared_state(f"sqlite:///{tmp_path}/state.db"), SQLiteSharedState)
+    assert isinstance(open_shared_state(redis_server.url), RedisSharedState)
+    with pytest.raises(ValueError):
+        open_shared_state("memcached://localhost")
+
+
+def test_resp_client_authenticates_and_reconnects(redis_server):
+    redis_server.password = "s3cret"
+    state = RedisSharedState(redis_server.url)
+    assert state.check()
+
+    # A dropped connection is re-established (and re-authenticated) on the next command
+    state._conn._sock.shutdown(2)
+    assert state.next_block("order_id", 5) == 1
+    assert redis_server.commands.count("AUTH") == 2
+
+
+def test_resp_client_does_not_resend_a_command_that_may_have_run(redis_server):
+    state = RedisSharedState(redis_server.url)
+    state.init_stock({"vitamin_c": 5})
+    redis_server.drop_after = {"DECRBY", "GET"}
+
+    with pytest.raises((OSError, EOFError)):
+        state.reserve_stock("vitamin_c")
+    with pytest.raises((OSError, EOFError)):
+        state.get_stock("vitamin_c")  # Resent once, lost again
+    redis_server.drop_after = set()
+
+    assert state.get_stock("vitamin_c") == 4
+    assert redis_server.commands.count("DECRBY") == 1
+    assert redis_server.commands.count("GET") == 3
+
+
+def test_sqlite_sweeps_expired_counters(tmp_path):
+    state = SQLiteSharedState(str(tmp_path / "shared_state.db"))
+    for n in range(99):
+        state.incr(f"chat/10.0.0.{n}", -1)
+    assert state._conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0] == 99
+
+    state.incr("chat/10.0.1.1", 60)
+    assert state._conn.execute("SELECT key FROM counters").fetchall() == [("chat/10.0.1.1",)]
+
+
+def test_resp_client_surfaces_server_errors(redis_server):
+    connection = _RespConnection("127.0.0.1", redis_server.server_address[1])
+
+    with pytest.raises(RedisError, match="unknown command"):
+        connection.execute("FLUSHALL")
+    assert connection.execute("SET", "key", "välue") == "OK"
+    assert connection.execute("GET", "key") == "välue"
+    assert connection.execute("GET", "missing") is None
+    assert connection.execute("KEYS", "k*") == ["key"]
+
+
+def test_conversation_history_is_shared_between_workers(backend, second_backend):
+    worker_a = SharedConversationStore(backend, max_turns=2, summary_chars=40)
+    worker_b = SharedConversationStore(second_backend, max_turns=2, summary_chars=40)
+    sid = worker_a.new_id()
+
+    for n in range(4):
+        (worker_a if n % 2 else worker_b).append(sid, f"question  {n}", f"answer {n}")
+
+    assert worker_a.history(sid) == [{"user": "question  2", "bot": "answer 2"},
+                                     {"user": "question  3", "bot": "answer 3"}]
+    assert worker_b.history(sid) == worker_a.history(sid)
+    assert worker_b.summary(sid) == "question 0; question 1"
+    assert worker_a.history("unknown") == [] and worker_a.summary("unknown") == ""